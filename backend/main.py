@@ -4,12 +4,13 @@ API FastAPI pour l'analyse du dataset Superstore
 📊 KPI e-commerce + Matrices BCG, Waterfall, Analyses temporelles avancées
 """
 
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 from pydantic import BaseModel
 import logging
 
@@ -80,6 +81,8 @@ class KPIGlobaux(BaseModel):
     profit_total: float
     marge_moyenne: float
     marge_brute_par_commande: float
+    articles_par_commande: float
+    ca_par_client: float
 
 class ProduitTop(BaseModel):
     produit: str
@@ -121,6 +124,26 @@ def filtrer_dataframe(
     
     return df_filtered
 
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+
+def reponse_arrow(data: pd.DataFrame) -> Response:
+    """Sérialise un dataframe en flux Arrow IPC (évite l'encodage/décodage JSON ligne à ligne)"""
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_MIME)
+
+def projeter_champs(records: List[dict], fields: Optional[str]) -> List[dict]:
+    """Ne conserve que les champs demandés (liste séparée par des virgules) ; 400 si un champ est inconnu"""
+    if not fields:
+        return records
+    champs = [champ.strip() for champ in fields.split(",") if champ.strip()]
+    inconnus = [champ for champ in champs if records and champ not in records[0]]
+    if inconnus:
+        raise HTTPException(status_code=400, detail=f"Champs inconnus : {', '.join(inconnus)}")
+    return [{champ: ligne[champ] for champ in champs} for ligne in records]
+
 # === ENDPOINTS EXISTANTS ===
 
 @app.get("/", tags=["Info"])
@@ -149,7 +172,10 @@ def root():
             "performance_geo": "/kpi/geographique",
             "geo_etats": "/kpi/geographique/etats",
             "geo_villes": "/kpi/geographique/villes",
-            "analyse_clients": "/kpi/clients"
+            "analyse_clients": "/kpi/clients",
+            "top_clients": "/kpi/clients/top",
+            "recurrence_clients": "/kpi/clients/recurrence",
+            "segments_clients": "/kpi/clients/segments"
         }
     }
 
@@ -172,6 +198,8 @@ def get_kpi_globaux(
     profit_total = df_filtered['Profit'].sum()
     marge_moyenne = (profit_total / ca_total * 100) if ca_total > 0 else 0
     marge_brute_par_commande = profit_total / nb_commandes if nb_commandes > 0 else 0
+    articles_par_commande = quantite_vendue / nb_commandes if nb_commandes > 0 else 0
+    ca_par_client = ca_total / nb_clients if nb_clients > 0 else 0
 
     return KPIGlobaux(
         ca_total=round(ca_total, 2),
@@ -181,15 +209,22 @@ def get_kpi_globaux(
         quantite_vendue=quantite_vendue,
         profit_total=round(profit_total, 2),
         marge_moyenne=round(marge_moyenne, 2),
-        marge_brute_par_commande=round(marge_brute_par_commande, 2)
+        marge_brute_par_commande=round(marge_brute_par_commande, 2),
+        articles_par_commande=round(articles_par_commande, 2),
+        ca_par_client=round(ca_par_client, 2)
     )
 
 @app.get("/kpi/produits/top", tags=["KPI"])
 def get_top_produits(
+    request: Request,
     limite: int = Query(10, ge=1, le=50, description="Nombre de produits à retourner"),
     tri_par: str = Query("ca", regex="^(ca|profit|quantite)$", description="Critère de tri")
 ):
-    """🏆 TOP PRODUITS"""
+    """
+    🏆 TOP PRODUITS
+
+    Répond en Arrow IPC (stream) si le client envoie `Accept: application/vnd.apache.arrow.stream`
+    """
     produits = df.groupby(['Product Name', 'Category']).agg({
         'Sales': 'sum',
         'Quantity': 'sum',
@@ -215,6 +250,8 @@ def get_top_produits(
             "profit": round(row['Profit'], 2)
         })
     
+    if ARROW_MIME in request.headers.get("accept", ""):
+        return reponse_arrow(pd.DataFrame(result))
     return result
 
 # === NOUVEAUX ENDPOINTS - TAB 1 : PRODUITS AVANCÉS ===
@@ -629,14 +666,21 @@ def get_temporel_avance():
             "variation_yoy": variation_yoy
         })
     
+    # Statistiques par période calculées une seule fois côté API
+    ca_moyen = round(monthly['Sales'].mean(), 2)
+    meilleur_mois = monthly.loc[monthly['Sales'].idxmax(), 'periode_str']
+
     return {
         "data": result,
         "annees_disponibles": [int(y) for y in years],
         "statistiques": {
-            "ca_moyen_mensuel": round(monthly['Sales'].mean(), 2),
+            "ca_moyen_mensuel": ca_moyen,
             "croissance_moyenne": round(monthly['croissance_pct'].mean(), 2),
-            "meilleur_mois": monthly.loc[monthly['Sales'].idxmax(), 'periode_str'],
-            "pire_mois": monthly.loc[monthly['Sales'].idxmin(), 'periode_str']
+            "meilleur_mois": meilleur_mois,
+            "pire_mois": monthly.loc[monthly['Sales'].idxmin(), 'periode_str'],
+            "ca_moyen_periode": ca_moyen,
+            "commandes_moyen_periode": int(monthly['Order ID'].mean()),
+            "meilleure_periode": meilleur_mois
         }
     }
 
@@ -717,7 +761,10 @@ def get_performance_etats():
     }
 
 @app.get("/kpi/geographique/villes", tags=["KPI Avancés - Géographique"])
-def get_top_villes(limite: int = Query(20, ge=5, le=100)):
+def get_top_villes(
+    limite: int = Query(20, ge=5, le=100),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules (ex: ca,ville,region)")
+):
     """
     🏙️ TOP VILLES
     
@@ -749,6 +796,9 @@ def get_top_villes(limite: int = Query(20, ge=5, le=100)):
             "ca_par_client": round(row['ca_par_client'], 2)
         })
 
+    # Projection des colonnes demandées (réduit la taille de la réponse JSON)
+    result_ca = projeter_champs(result_ca, fields)
+
     return {
         "top_ca": result_ca,
         "statistiques": {
@@ -934,7 +984,10 @@ def get_delai_rachat():
         raise HTTPException(status_code=500, detail=f"Erreur lors du calcul du délai de réachat : {str(e)}")
 
 @app.get("/kpi/clients/clv", tags=["KPI Avancés - Clients"])
-def get_customer_lifetime_value(limite: int = Query(50, ge=10, le=200)):
+def get_customer_lifetime_value(
+    limite: int = Query(50, ge=10, le=200),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules")
+):
     """
     💰 CUSTOMER LIFETIME VALUE (CLV)
 
@@ -1005,7 +1058,7 @@ def get_customer_lifetime_value(limite: int = Query(50, ge=10, le=200)):
     cat_stats.columns = ['categorie', 'nb_clients', 'clv_total', 'profit_total']
 
     return {
-        "top_clients": result,
+        "top_clients": projeter_champs(result, fields),
         "statistiques": {
             "clv_moyenne": round(clients_clv['clv_3_ans'].mean(), 2),
             "clv_mediane": round(clv_median, 2),
@@ -1084,11 +1137,8 @@ def get_taux_retention():
 
 # === ENDPOINT CLIENTS (EXISTANT) ===
 
-@app.get("/kpi/clients", tags=["KPI"])
-def get_analyse_clients(
-    limite: int = Query(10, ge=1, le=100, description="Nombre de top clients")
-):
-    """👥 ANALYSE CLIENTS"""
+def agreger_clients() -> pd.DataFrame:
+    """Agrégation par client : CA, profit, nombre de commandes et valeur moyenne de commande"""
     clients = df.groupby('Customer ID').agg({
         'Sales': 'sum',
         'Profit': 'sum',
@@ -1098,33 +1148,71 @@ def get_analyse_clients(
     
     clients.columns = ['customer_id', 'ca_total', 'profit_total', 'nb_commandes', 'nom']
     clients['valeur_commande_moy'] = (clients['ca_total'] / clients['nb_commandes']).round(2)
-    
-    top_clients = clients.sort_values('ca_total', ascending=False).head(limite)
-    
-    recurrence = {
+    return clients
+
+def calculer_recurrence(clients: pd.DataFrame) -> dict:
+    """Indicateurs de récurrence d'achat à partir de l'agrégation par client"""
+    clients_recurrents = len(clients[clients['nb_commandes'] > 1])
+    total_clients = len(clients)
+
+    return {
         "clients_1_achat": len(clients[clients['nb_commandes'] == 1]),
-        "clients_recurrents": len(clients[clients['nb_commandes'] > 1]),
+        "clients_recurrents": clients_recurrents,
         "nb_commandes_moyen": round(clients['nb_commandes'].mean(), 2),
-        "total_clients": len(clients)
+        "total_clients": total_clients,
+        "taux_fidelisation": round(clients_recurrents / total_clients * 100, 2) if total_clients > 0 else 0
     }
-    
+
+def agreger_segments() -> List[dict]:
+    """CA, profit et nombre de clients par segment"""
     segments = df.groupby('Segment').agg({
         'Sales': 'sum',
         'Profit': 'sum',
         'Customer ID': 'nunique'
     }).reset_index()
     segments.columns = ['segment', 'ca', 'profit', 'nb_clients']
+    return segments.to_dict('records')
+
+@app.get("/kpi/clients", tags=["KPI"])
+def get_analyse_clients(
+    limite: int = Query(10, ge=1, le=100, description="Nombre de top clients")
+):
+    """👥 ANALYSE CLIENTS"""
+    clients = agreger_clients()
+    top_clients = clients.sort_values('ca_total', ascending=False).head(limite)
     
     return {
         "top_clients": top_clients.to_dict('records'),
-        "recurrence": recurrence,
-        "segments": segments.to_dict('records')
+        "recurrence": calculer_recurrence(clients),
+        "segments": agreger_segments()
     }
 
+@app.get("/kpi/clients/top", tags=["KPI"])
+def get_top_clients(
+    limite: int = Query(10, ge=1, le=100, description="Nombre de top clients")
+):
+    """🏆 TOP CLIENTS par CA (seule partie de /kpi/clients dépendant de `limite`)"""
+    clients = agreger_clients()
+    return clients.sort_values('ca_total', ascending=False).head(limite).to_dict('records')
+
+@app.get("/kpi/clients/recurrence", tags=["KPI"])
+def get_recurrence_clients():
+    """🔄 RÉCURRENCE D'ACHAT des clients"""
+    return calculer_recurrence(agreger_clients())
+
+@app.get("/kpi/clients/segments", tags=["KPI"])
+def get_segments_clients():
+    """🎯 PERFORMANCE PAR SEGMENT client"""
+    return agreger_segments()
+
 # === ENDPOINT ANALYSE ABC (PARETO) ===
 
 @app.get("/kpi/analyse-abc", tags=["KPI Avancés - Analyse ABC"])
-def get_analyse_abc(niveau: str = Query("produit", regex="^(produit|categorie|client)$")):
+def get_analyse_abc(
+    niveau: str = Query("produit", regex="^(produit|categorie|client)$"),
+    top: Optional[int] = Query(None, ge=1, le=5000, description="Nombre d'éléments détaillés à retourner"),
+    classe: Optional[str] = Query(None, regex="^(A|B|C)$", description="Ne détailler qu'une classe (A, B ou C)")
+):
     """
     📊 ANALYSE ABC (PARETO)
 
@@ -1134,6 +1222,9 @@ def get_analyse_abc(niveau: str = Query("produit", regex="^(produit|categorie|cl
     - Classe C : 5% du CA (faible importance)
 
     Niveaux d'analyse : produit, categorie, client
+
+    `top` et `classe` ne limitent que la liste détaillée : les statistiques
+    par classe portent toujours sur l'ensemble des éléments.
     """
 
     if niveau == "produit":
@@ -1231,9 +1322,16 @@ def get_analyse_abc(niveau: str = Query("produit", regex="^(produit|categorie|cl
     stats_classes['pct_nombre'] = (stats_classes['nombre'] / len(data) * 100).round(2)
     stats_classes['pct_ca'] = (stats_classes['ca_total'] / ca_total * 100).round(2)
 
+    # Limiter le détail renvoyé (les éléments sont déjà triés par CA décroissant)
+    detail = data
+    if classe:
+        detail = detail[detail['classe'].str.startswith(classe)]
+    if top:
+        detail = detail.head(top)
+
     # Préparer les données pour le retour
     result = []
-    for _, row in data.iterrows():
+    for _, row in detail.iterrows():
         result.append({
             "nom": row['nom'],
             "categorie": row.get('categorie', ''),
@@ -1257,7 +1355,10 @@ def get_analyse_abc(niveau: str = Query("produit", regex="^(produit|categorie|cl
 # === ENDPOINTS ANALYSE DÉTAILLÉE ===
 
 @app.get("/kpi/commandes/deficitaires", tags=["KPI Avancés - Analyse Détaillée"])
-def get_commandes_deficitaires(limite: int = Query(50, ge=10, le=200)):
+def get_commandes_deficitaires(
+    limite: int = Query(50, ge=10, le=200),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules")
+):
     """
     🔴 COMMANDES DÉFICITAIRES
 
@@ -1300,7 +1401,7 @@ def get_commandes_deficitaires(limite: int = Query(50, ge=10, le=200)):
     nb_total_deficitaires = len(commandes[commandes['Profit'] < 0])
 
     return {
-        "data": result,
+        "data": projeter_champs(result, fields),
         "statistiques": {
             "nb_commandes_deficitaires": nb_total_deficitaires,
             "perte_totale": round(total_perte, 2),
@@ -1370,7 +1471,10 @@ def get_impact_remises():
     }
 
 @app.get("/kpi/produits/cout-prix", tags=["KPI Avancés - Analyse Détaillée"])
-def get_cout_prix_unitaire(limite: int = Query(30, ge=10, le=100)):
+def get_cout_prix_unitaire(
+    limite: int = Query(30, ge=10, le=100),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules")
+):
     """
     💰 COÛT & PRIX UNITAIRE
 
@@ -1406,7 +1510,7 @@ def get_cout_prix_unitaire(limite: int = Query(30, ge=10, le=100)):
 
     # Statistiques
     return {
-        "data": result,
+        "data": projeter_champs(result, fields),
         "statistiques": {
             "prix_unitaire_moyen": round(produits['prix_unitaire'].mean(), 2),
             "cout_unitaire_moyen": round(produits['cout_unitaire'].mean(), 2),
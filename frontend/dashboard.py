@@ -9,10 +9,19 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import pyarrow as pa
+import orjson
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+import threading
 import os
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from formatage import formater_euro, formater_nombre, formater_pourcentage
 
 # === CONFIGURATION PAGE ===
 st.set_page_config(
@@ -78,44 +87,976 @@ st.markdown("""
 
 # === CONFIGURATION API ===
 API_URL = os.getenv("API_URL", "http://localhost:8000")
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+
+# Colonnes affichées par les sous-onglets à slider (projection côté API)
+_CHAMPS_CLV = "client,ca_total,nb_commandes,ca_annuel,clv_3_ans,profit_clv_3_ans,categorie"
+_CHAMPS_CMD_DEF = "order_id,date,client,categories,ca,profit,perte_abs,marge_pct,discount_moyen"
+_CHAMPS_COUT = "produit,categorie,prix_unitaire,cout_unitaire,marge_unitaire,marge_pct,quantite_vendue"
+
+# === PALETTES DE COULEURS ===
+_SET2 = tuple(px.colors.qualitative.Set2)
+_SET3 = tuple(px.colors.qualitative.Set3)
+_PLOTLY = tuple(px.colors.qualitative.Plotly)
+
+# Couleurs des quadrants (libellés fixés par l'API)
+_BCG_COLOR_MAP = MappingProxyType({
+    "Étoile ⭐": "#28a745",
+    "Vache à lait 🐄": "#007bff",
+    "Dilemme ❓": "#ffc107",
+    "Poids mort 💀": "#dc3545"
+})
+_MATRIX_COLOR_MAP = MappingProxyType({
+    "Q1 - Priorité 🌟": "#28a745",
+    "Q2 - À optimiser ⚙️": "#ffc107",
+    "Q3 - À développer 📈": "#007bff",
+    "Q4 - À abandonner ❌": "#dc3545"
+})
+# Catégories CLV (libellés fixés par l'API /kpi/clients/clv)
+_CLV_COLOR_MAP = MappingProxyType({
+    "Très élevée 🌟": "#28a745",
+    "Élevée 💎": "#007bff",
+    "Moyenne 📊": "#ffc107",
+    "Faible 📉": "#dc3545"
+})
+# Classes ABC : ordre et couleurs fixes, indépendants du niveau d'analyse
+_ABC_COLOR_MAP = MappingProxyType({
+    "A 🌟": "#28a745",
+    "B 📊": "#ffc107",
+    "C 📉": "#dc3545"
+})
+# Catégories de produits : couleur fixe, quelles que soient les catégories présentes dans le top
+_CAT_COLOR_MAP = MappingProxyType({
+    "Furniture": _SET2[0],
+    "Office Supplies": _SET2[1],
+    "Technology": _SET2[2]
+})
+# Modes d'expédition, du plus rapide au plus lent (libellés fixés par les données)
+_ORDRE_MODES = ('Same Day', 'First Class', 'Second Class', 'Standard Class')
 
 # === FONCTIONS HELPERS ===
 
-@st.cache_data(ttl=300)
 def appeler_api(endpoint: str, params: dict = None):
-    """Appelle l'API et retourne les données"""
+    """Appelle l'API et retourne les données (mise en cache par endpoint + paramètres)"""
     try:
-        url = f"{API_URL}{endpoint}"
-        response = requests.get(url, params=params, timeout=15)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.ConnectionError:
+        return _appeler_cached(endpoint, tuple(sorted((params or {}).items())))
+    except Exception as e:
+        afficher_erreur_api(e)
+
+@st.cache_resource(ttl=300, max_entries=128, show_spinner=False)
+def _appeler_cached(endpoint: str, params_key: tuple):
+    """Worker mis en cache : la clé est un tuple trié, bien moins coûteux à hacher qu'un dict.
+
+    cache_resource renvoie le même objet à chaque lecture (ni copie ni sérialisation) :
+    les réponses JSON sont partagées et ne doivent jamais être modifiées par l'appelant.
+    Les erreurs sont levées sans rien afficher (jamais mises en cache, utilisable depuis un thread).
+    """
+    return _requete_brute(endpoint, params_key, _decoder_json)
+
+def _decoder_json(response: requests.Response):
+    """Décode le corps JSON d'une réponse avec orjson"""
+    return orjson.loads(response.content)
+
+@st.cache_resource
+def _session_api() -> requests.Session:
+    """Session HTTP partagée : connexions keep-alive réutilisées entre appels, reruns et threads"""
+    session = requests.Session()
+    adaptateur = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=Retry(total=2, backoff_factor=0.1))
+    session.mount('http://', adaptateur)
+    session.mount('https://', adaptateur)
+    return session
+
+def _requete_brute(endpoint: str, params_key: tuple, decoder, headers: dict = None):
+    """Exécute la requête et décode la réponse ; les erreurs sont levées, sans rien afficher"""
+    url = f"{API_URL}{endpoint}"
+    response = _session_api().get(url, params=dict(params_key), headers=headers, timeout=15)
+    response.raise_for_status()
+    return decoder(response)
+
+def _requete_api(endpoint: str, params_key: tuple, decoder, headers: dict = None):
+    """Exécute la requête et décode la réponse ; en cas d'échec, affiche l'erreur et arrête le script"""
+    try:
+        return _requete_brute(endpoint, params_key, decoder, headers)
+    except Exception as e:
+        afficher_erreur_api(e)
+
+def afficher_erreur_api(erreur: Exception):
+    """Affiche l'erreur d'un appel API puis arrête le script (à appeler depuis le thread du script)"""
+    if isinstance(erreur, requests.exceptions.ConnectionError):
         st.error("❌ **Impossible de se connecter à l'API**")
         st.info(f"💡 Vérifiez que l'API est démarrée sur: {API_URL}")
-        st.stop()
-    except requests.exceptions.Timeout:
+    elif isinstance(erreur, requests.exceptions.Timeout):
         st.error("⏱️ **Timeout : l'API met trop de temps à répondre**")
-        st.stop()
-    except requests.exceptions.HTTPError as e:
-        st.error(f"⚠️ **Erreur HTTP** : {e}")
-        st.stop()
+    elif isinstance(erreur, requests.exceptions.HTTPError):
+        st.error(f"⚠️ **Erreur HTTP** : {erreur}")
+    else:
+        st.error(f"⚠️ **Erreur inattendue** : {erreur}")
+    st.stop()
+
+def charger_df(endpoint: str, params: dict = None, cle: str = None) -> pd.DataFrame:
+    """Retourne la réponse de l'API (ou sa clé `cle`) sous forme de DataFrame, mise en cache"""
+    try:
+        return _df_cached(endpoint, tuple(sorted((params or {}).items())), cle)
     except Exception as e:
-        st.error(f"⚠️ **Erreur inattendue** : {e}")
-        st.stop()
+        afficher_erreur_api(e)
+
+@st.cache_data(ttl=300, max_entries=128, show_spinner=False)
+def _df_cached(endpoint: str, params_key: tuple, cle: str):
+    """Worker mis en cache : évite l'appel API et la construction du DataFrame à chaque rerun"""
+    payload = _appeler_cached(endpoint, params_key)
+    return pd.DataFrame(payload[cle] if cle else payload)
+
+def charger_df_arrow(endpoint: str, params: dict = None) -> pd.DataFrame:
+    """DataFrame reçu au format Arrow IPC (endpoints tabulaires qui le proposent), mis en cache"""
+    return _df_arrow_cached(endpoint, tuple(sorted((params or {}).items())))
+
+@st.cache_data(ttl=300, max_entries=128, show_spinner=False)
+def _df_arrow_cached(endpoint: str, params_key: tuple):
+    """Worker mis en cache : flux Arrow décodé directement en colonnes, sans passer par JSON"""
+    return _requete_api(
+        endpoint, params_key,
+        lambda response: pa.ipc.open_stream(response.content).read_pandas(),
+        headers={'Accept': ARROW_MIME}
+    )
+
+@st.cache_resource
+def _executeur_api() -> ThreadPoolExecutor:
+    """Pool de threads partagé par toutes les sessions : créé une seule fois, pas à chaque rerun"""
+    return ThreadPoolExecutor(max_workers=4)
+
+def lancer_en_arriere_plan(fonction, *args):
+    """Exécute fonction(*args) dans le pool de threads et retourne la future"""
+    ctx = get_script_run_ctx()
+
+    def _executer():
+        # Le contexte du script permet à st.cache_data / st.error de fonctionner dans le thread
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fonction(*args)
+
+    return _executeur_api().submit(_executer)
+
+def precharger_api(appels: dict) -> dict:
+    """Lance les appels API {nom: (endpoint, params_key)} en parallèle et retourne les futures"""
+    return {nom: lancer_en_arriere_plan(_appeler_cached, endpoint, params_key) for nom, (endpoint, params_key) in appels.items()}
+
+def attendre_prechargements(futures: dict):
+    """Attend les appels préchargés ; une erreur est affichée depuis le thread du script"""
+    try:
+        for futur in futures.values():
+            futur.result()
+    except Exception as e:
+        afficher_erreur_api(e)
 
-def formater_euro(valeur: float) -> str:
-    return f"{valeur:,.2f} €".replace(",", " ").replace(".", ",")
+# L'endpoint racine sert aussi de vérification de connexion : TTL court pour détecter une API arrêtée
+@st.cache_resource(ttl=30, show_spinner=False)
+def charger_info_api():
+    """Version de l'API et taille du dataset (endpoint racine)"""
+    return _requete_api("/", (), _decoder_json)
 
-def formater_nombre(valeur: int) -> str:
-    return f"{valeur:,}".replace(",", " ")
+# Valeurs des filtres : ne changent qu'au déploiement, un appel par heure suffit
+@st.cache_resource(ttl=3600, show_spinner=False)
+def charger_valeurs_filtres():
+    """Valeurs possibles des filtres (catégories, régions, segments, dates) : quasi statiques.
 
-def formater_pourcentage(valeur: float) -> str:
-    return f"{valeur:.2f}%"
+    Chargées en arrière-plan : les erreurs sont levées et affichées par le thread du script.
+    """
+    valeurs = _requete_brute("/filters/valeurs", (), _decoder_json)
+    # Dates parsées une seule fois, dans le cache
+    return {
+        **valeurs,
+        'date_min': date.fromisoformat(valeurs['plage_dates']['min']),
+        'date_max': date.fromisoformat(valeurs['plage_dates']['max'])
+    }
+
+def ordonner_modes(df: pd.DataFrame) -> pd.DataFrame:
+    """Convertit 'mode' en catégorie ordonnée et trie les lignes du mode le plus rapide au plus lent"""
+    df['mode'] = pd.Categorical(df['mode'], categories=_ORDRE_MODES, ordered=True)
+    return df.sort_values('mode', ignore_index=True)
+
+# Longueur maximale des noms de produits affichés sur les axes
+_LIBELLE_MAX = 30
+
+def tronquer_libelles(libelles: pd.Series, n: int = _LIBELLE_MAX) -> np.ndarray:
+    """Coupe les libellés à n caractères, en n'ajoutant "..." qu'à ceux qui dépassent"""
+    return np.where(libelles.str.len() > n, libelles.str.slice(0, n) + '...', libelles)
+
+# Nombre maximal de parts d'un camembert avant regroupement en "Autres"
+_PARTS_MAX = 8
+
+def regrouper_autres(data: pd.DataFrame, libelle: str, valeur: str, n: int = _PARTS_MAX) -> pd.DataFrame:
+    """Conserve les n plus grandes parts et cumule les suivantes dans une part "Autres" """
+    if len(data) <= n:
+        return data
+    data = data.sort_values(valeur, ascending=False)
+    autres = pd.DataFrame({libelle: ["Autres"], valeur: [data[valeur].iloc[n:].sum()]})
+    return pd.concat([data.head(n), autres], ignore_index=True)
+
+# Au-delà de ce nombre de points, les séries sont sous-échantillonnées (LTTB)
+_LTTB_SEUIL = 800
+
+def indices_lttb(y, n_out: int = _LTTB_SEUIL) -> np.ndarray:
+    """Sous-échantillonnage Largest-Triangle-Three-Buckets : positions des points conservant la forme de la série"""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    rang = np.arange(n, dtype=float)
+    bornes = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        debut, fin = bornes[i], bornes[i + 1]
+        suivant_fin = bornes[i + 2] if i + 2 < len(bornes) else n
+        # Point retenu : celui qui forme le plus grand triangle avec le précédent et la moyenne du seau suivant
+        x_moy, y_moy = rang[fin:suivant_fin].mean(), y[fin:suivant_fin].mean()
+        aires = np.abs((rang[a] - x_moy) * (y[debut:fin] - y[a]) - (rang[a] - rang[debut:fin]) * (y_moy - y[a]))
+        a = debut + int(aires.argmax())
+        indices[i + 1] = a
+    return indices
+
+@st.cache_resource
+def _squelette_temporel(webgl: bool):
+    """Graphique temporel complet (sous-graphiques, axes, traces vides), construit une fois par type de rendu"""
+    fig = make_subplots(
+        rows=2, cols=1,
+        subplot_titles=("Évolution du CA et Profit", "Évolution du Nombre de Commandes"),
+        vertical_spacing=0.12,
+        specs=[[{"secondary_y": False}], [{"secondary_y": False}]]
+    )
+    # Rendu WebGL pour la granularité journalière (plus d'un millier de points)
+    Trace = go.Scattergl if webgl else go.Scatter
+    fig.add_trace(
+        Trace(mode='lines+markers', name='CA', line=dict(color='#667eea', width=3), fill='tozeroy'),
+        row=1, col=1
+    )
+    fig.add_trace(
+        Trace(mode='lines+markers', name='Profit', line=dict(color='#764ba2', width=3)),
+        row=1, col=1
+    )
+    fig.add_trace(go.Bar(name='Commandes', marker_color='#f39c12'), row=2, col=1)
+    fig.update_xaxes(title_text="Période", row=2, col=1)
+    fig.update_yaxes(title_text="Montant (€)", row=1, col=1)
+    fig.update_yaxes(title_text="Nombre", row=2, col=1)
+    fig.update_layout(height=700, showlegend=True, uirevision='constant')
+    return fig
+
+# Pas de ré-échantillonnage et libellé de période renvoyé par l'API pour chaque granularité
+_PAS_TEMPOREL = {'mois': pd.offsets.MonthBegin(), 'annee': pd.offsets.YearBegin()}
+_FORMAT_PERIODE = {'mois': '%Y-%m', 'annee': '%Y'}
+
+@st.cache_data(ttl=300, show_spinner=False)
+def serie_temporelle(granularite: str) -> pd.DataFrame:
+    """Série temporelle à la granularité demandée, ré-échantillonnée depuis la série journalière (un seul appel API)"""
+    df_jour = charger_df("/kpi/temporel", params={'periode': 'jour'})
+    df_jour = df_jour.assign(periode=pd.to_datetime(df_jour['periode']))
+    if granularite == 'jour':
+        return df_jour
+    df_periode = (
+        df_jour.set_index('periode')
+        .resample(_PAS_TEMPOREL[granularite])[['ca', 'profit', 'nb_commandes', 'quantite']]
+        .sum()
+        .reset_index()
+    )
+    # Mêmes libellés que l'API ('YYYY-MM' / 'YYYY') plutôt que des dates de début de période
+    df_periode['periode'] = df_periode['periode'].dt.strftime(_FORMAT_PERIODE[granularite])
+    return df_periode
+
+# === GRAPHIQUES MIS EN CACHE ===
+# Les figures ne sont reconstruites que si la réponse de l'API change :
+# un widget d'un autre onglet ne déclenche plus leur reconstruction.
+
+@st.cache_resource
+def _base_fig_produits(critere_tri: str):
+    """Structure du graphique Top produits (axes, légende, layout) pour un critère de tri"""
+    fig = go.Figure()
+    fig.update_layout(
+        xaxis_title={'ca': 'CA (€)', 'profit': 'Profit (€)', 'quantite': 'Quantité'}[critere_tri],
+        yaxis_title='Produit',
+        yaxis={'categoryorder': 'total ascending'},
+        legend_title_text='categorie',
+        barmode='relative',
+        height=500,
+        uirevision='constant'
+    )
+    return fig
+
+def preparer_df_bcg(records: list) -> pd.DataFrame:
+    """DataFrame BCG typé, restreint aux produits ayant du CA sur l'année en cours"""
+    df_bcg = pd.DataFrame.from_records(
+        records,
+        columns=['produit', 'categorie', 'ca_actuel', 'croissance', 'part_marche', 'marge_pct', 'quadrant']
+    ).astype({'ca_actuel': 'float32', 'croissance': 'float32', 'part_marche': 'float32', 'marge_pct': 'float32'}, copy=False)
+    return df_bcg.loc[df_bcg['ca_actuel'].to_numpy() > 0]
+
+@st.cache_data(show_spinner=False)
+def construire_fig_bcg(bcg_data: dict) -> go.Figure:
+    """📊 Matrice BCG"""
+    df_bcg_pos = preparer_df_bcg(bcg_data['data'])
+
+    # Graphique BCG
+    # Une trace WebGL par quadrant (évite la réécriture tidy-data de plotly express)
+    sizeref_bcg = 2.0 * df_bcg_pos['ca_actuel'].max() / (20 ** 2) if not df_bcg_pos.empty else 1
+    # Infobulle formatée côté navigateur (d3), partagée par toutes les traces
+    hover_bcg = (
+        "<b>%{customdata[0]}</b><br>"
+        "Catégorie : %{customdata[1]}<br>"
+        "CA : %{customdata[2]:,.2f} €<br>"
+        "Marge : %{customdata[3]:.2f}%<br>"
+        "Part de marché : %{x:.4f}%<br>"
+        "Croissance : %{y:.2f}%<extra></extra>"
+    )
+    fig_bcg = go.Figure()
+    for quadrant, couleur in _BCG_COLOR_MAP.items():
+        sub = df_bcg_pos[df_bcg_pos['quadrant'] == quadrant]
+        fig_bcg.add_trace(go.Scattergl(
+            x=sub['part_marche'],
+            y=sub['croissance'],
+            mode='markers',
+            name=quadrant,
+            marker=dict(
+                size=sub['ca_actuel'].to_numpy(), sizemode='area', sizeref=sizeref_bcg,
+                color=couleur, line=dict(width=0.5, color='white')
+            ),
+            customdata=sub[['produit', 'categorie', 'ca_actuel', 'marge_pct']].to_numpy(),
+            hovertemplate=hover_bcg
+        ))
+    fig_bcg.update_layout(
+        title=f"Matrice BCG - {bcg_data['seuils']['annee_precedente']} vs {bcg_data['seuils']['annee_actuelle']}",
+        xaxis_title='Part de marché (%)',
+        yaxis_title='Croissance YoY (%)',
+        legend_title_text='Quadrant',
+        height=600
+    )
+
+    # Ajouter les lignes de seuil
+    fig_bcg.add_hline(y=10, line_dash="dash", line_color="gray", annotation_text="Seuil croissance (10%)")
+    fig_bcg.add_vline(x=0.5, line_dash="dash", line_color="gray", annotation_text="Seuil part marché (0.5%)")
+
+    fig_bcg.update_layout(
+        xaxis_type="log",
+        showlegend=True
+    )
+    return fig_bcg
+
+@st.cache_data(show_spinner=False)
+def construire_fig_matrix(matrix_data: dict) -> go.Figure:
+    """🎯 Matrice Performance/Marge"""
+    df_matrix = pd.DataFrame(matrix_data['data']).astype(
+        {'ca': 'float32', 'marge_pct': 'float32', 'profit': 'float32'}, copy=False
+    )
+
+    # Graphique scatter
+    # Use absolute value of profit for size (scatter size must be non-negative)
+    profit_abs = np.abs(df_matrix['profit'].to_numpy())
+
+    sizeref_matrix = 2.0 * profit_abs.max() / (20 ** 2) if profit_abs.size else 1
+    hover_matrix = (
+        "<b>%{customdata[0]}</b><br>"
+        "Catégorie : %{customdata[1]}<br>"
+        "CA : %{x:,.2f} €<br>"
+        "Marge : %{y:.2f}%<br>"
+        "Profit : %{customdata[2]:,.2f} €<br>"
+        "Action : %{customdata[3]}<extra></extra>"
+    )
+    fig_matrix = go.Figure()
+    for quadrant, couleur in _MATRIX_COLOR_MAP.items():
+        masque = (df_matrix['quadrant'] == quadrant).to_numpy()
+        sub = df_matrix[masque]
+        fig_matrix.add_trace(go.Scattergl(
+            x=sub['ca'],
+            y=sub['marge_pct'],
+            mode='markers',
+            name=quadrant,
+            marker=dict(
+                size=profit_abs[masque], sizemode='area', sizeref=sizeref_matrix,
+                color=couleur, line=dict(width=0.5, color='white')
+            ),
+            customdata=sub[['sous_categorie', 'categorie', 'profit', 'action_recommandee']].to_numpy(),
+            hovertemplate=hover_matrix
+        ))
+    fig_matrix.update_layout(
+        title="Matrice Performance/Marge par Sous-catégorie",
+        xaxis_title='Chiffre d\'affaires (€)',
+        yaxis_title='Marge (%)',
+        legend_title_text='Quadrant',
+        height=550
+    )
+
+    # Lignes de seuil
+    fig_matrix.add_hline(y=matrix_data['seuils']['marge_median'], line_dash="dash", line_color="gray")
+    fig_matrix.add_vline(x=matrix_data['seuils']['ca_median'], line_dash="dash", line_color="gray")
+    return fig_matrix
+
+@st.cache_data(show_spinner=False)
+def construire_fig_faible_marge(faible_marge_data: dict) -> go.Figure:
+    """⚠️ Produits à faible marge : CA vs Marge"""
+    df_fm = pd.DataFrame(faible_marge_data['data']).astype(
+        {'ca': 'float32', 'marge_pct': 'float32'}, copy=False
+    )
+
+    # Libellés tronqués une seule fois
+    labels_fm = tronquer_libelles(df_fm['produit'])
+
+    # Graphique double axe : CA vs Marge (axe secondaire superposé, sans grille de sous-graphiques)
+    fig_fm = go.Figure()
+
+    fig_fm.add_trace(
+        go.Bar(
+            name='CA',
+            x=labels_fm,
+            y=df_fm['ca'],
+            marker_color='#3498db',
+            texttemplate='%{y:,.0f}€',
+            textposition='outside',
+            yaxis='y'
+        )
+    )
+
+    fig_fm.add_trace(
+        go.Scatter(
+            name='Marge %',
+            x=labels_fm,
+            y=df_fm['marge_pct'],
+            mode='lines+markers',
+            line=dict(color='#e74c3c', width=3),
+            marker=dict(size=10),
+            yaxis='y2'
+        )
+    )
+
+    fig_fm.update_layout(
+        title="Produits à faible marge : CA vs Marge",
+        height=500,
+        xaxis=dict(tickangle=-45),
+        yaxis=dict(title="CA (€)"),
+        yaxis2=dict(title="Marge (%)", overlaying='y', side='right')
+    )
+    return fig_fm
+
+@st.cache_data(show_spinner=False)
+def construire_figs_rfm(rfm_data: dict) -> tuple:
+    """🎯 Segments RFM : répartition des clients et CA par segment"""
+    df_segments_rfm = pd.DataFrame(rfm_data['segments'])
+
+    fig_rfm_pie = px.pie(
+        regrouper_autres(df_segments_rfm, 'segment', 'nb_clients'),
+        values='nb_clients',
+        names='segment',
+        title="Répartition des Clients par Segment RFM",
+        height=400,
+        color_discrete_sequence=_SET3
+    )
+    fig_rfm_pie.update_traces(textposition='inside', textinfo='percent+label')
+    fig_rfm_pie.update_layout(uirevision='constant')
+
+    fig_rfm_bar = px.bar(
+        df_segments_rfm,
+        y='segment',
+        x='ca_total',
+        orientation='h',
+        title="CA Total par Segment RFM",
+        labels={'ca_total': 'CA Total (€)', 'segment': 'Segment'},
+        color='ca_total',
+        color_continuous_scale='Greens',
+        height=400
+    )
+    # Tri délégué à Plotly : aucune copie triée du DataFrame
+    fig_rfm_bar.update_layout(yaxis={'categoryorder': 'total ascending'})
+    fig_rfm_bar.update_layout(uirevision='constant')
+    return fig_rfm_pie, fig_rfm_bar
+
+@st.cache_data(show_spinner=False)
+def construire_figs_remises(remises_data: dict) -> tuple:
+    """💸 Impact des remises : CA et marge par tranche de remise"""
+    df_remises = pd.DataFrame(remises_data['data'])
+
+    fig_remises_ca = go.Figure(go.Bar(
+        x=df_remises['tranche_discount'],
+        y=df_remises['ca_total'],
+        name='CA',
+        marker_color='#3498db',
+        texttemplate='%{y:,.0f}€',
+        textposition='outside'
+    ))
+    fig_remises_ca.update_layout(
+        title="Impact sur le CA",
+        xaxis_title="Tranche de remise",
+        yaxis_title="CA (€)",
+        height=400,
+        showlegend=False,
+        uirevision='constant'
+    )
+
+    fig_remises_marge = go.Figure(go.Bar(
+        x=df_remises['tranche_discount'],
+        y=df_remises['marge_pct'],
+        name='Marge %',
+        marker_color='#e74c3c',
+        texttemplate='%{y:.1f}%',
+        textposition='outside'
+    ))
+    fig_remises_marge.update_layout(
+        title="Impact sur la Marge",
+        xaxis_title="Tranche de remise",
+        yaxis_title="Marge (%)",
+        height=400,
+        showlegend=False,
+        uirevision='constant'
+    )
+    return fig_remises_ca, fig_remises_marge
+
+@st.cache_data(show_spinner=False)
+def construire_figs_delais(delais_data: dict) -> tuple:
+    """📦 Délais de livraison : par mode, distribution et par région"""
+    df_delais_mode = ordonner_modes(pd.DataFrame(delais_data['par_mode']))
+
+    fig_delais_mode = go.Figure()
+
+    fig_delais_mode.add_trace(go.Bar(
+        name='Délai Moyen',
+        x=df_delais_mode['mode'],
+        y=df_delais_mode['delai_moyen'],
+        marker_color='#3498db',
+        texttemplate='%{y:.1f}j',
+        textposition='outside'
+    ))
+
+    fig_delais_mode.add_trace(go.Bar(
+        name='Délai Médian',
+        x=df_delais_mode['mode'],
+        y=df_delais_mode['delai_median'],
+        marker_color='#2ecc71',
+        texttemplate='%{y:.1f}j',
+        textposition='outside'
+    ))
+
+    fig_delais_mode.update_layout(
+        title="Délais de Livraison par Mode d'Expédition",
+        xaxis_title="Mode d'Expédition",
+        yaxis_title="Délai (jours)",
+        barmode='group',
+        height=450,
+        uirevision='constant'
+    )
+
+    # Distribution des délais
+    distribution_delais = delais_data['distribution']
+    df_distrib_delais = pd.DataFrame({
+        'tranche': list(distribution_delais),
+        'nb_livraisons': list(distribution_delais.values())
+    })
+
+    fig_distrib_delais = go.Figure(go.Bar(
+        x=df_distrib_delais['tranche'],
+        y=df_distrib_delais['nb_livraisons'],
+        marker=dict(color=df_distrib_delais['nb_livraisons'], colorscale='Blues', showscale=True,
+                    colorbar=dict(title='Nombre de livraisons'))
+    ))
+    fig_distrib_delais.update_layout(
+        title="Distribution des Délais de Livraison",
+        xaxis_title="Tranche de délai",
+        yaxis_title="Nombre de livraisons",
+        height=400,
+        uirevision='constant'
+    )
+
+    # Par région (triée une seule fois, à la construction)
+    df_delais_region = pd.DataFrame(delais_data['par_region']).sort_values('delai_moyen').reset_index(drop=True)
+
+    fig_delais_region = go.Figure(go.Bar(
+        y=df_delais_region['region'],
+        x=df_delais_region['delai_moyen'],
+        orientation='h',
+        marker=dict(color=df_delais_region['delai_moyen'], colorscale='Oranges', showscale=True,
+                    colorbar=dict(title='Délai (j)'))
+    ))
+    fig_delais_region.update_layout(
+        title="Délai Moyen par Région",
+        xaxis_title="Délai (j)",
+        yaxis_title="Région",
+        height=400,
+        uirevision='constant'
+    )
+    return fig_delais_mode, fig_distrib_delais, fig_delais_region
+
+@st.cache_data(show_spinner=False)
+def construire_figs_retards(retards_data: dict) -> tuple:
+    """⏰ Livraisons tardives : taux par mode, par région et répartition par catégorie"""
+    df_retards_mode = ordonner_modes(pd.DataFrame(retards_data['par_mode']))
+
+    fig_retards_mode = go.Figure(go.Bar(
+        x=df_retards_mode['mode'],
+        y=df_retards_mode['taux_retard'],
+        texttemplate='%{y:.1f}%',
+        textposition='outside',
+        marker=dict(color=df_retards_mode['taux_retard'], colorscale='Reds', showscale=True,
+                    colorbar=dict(title='Taux de Retard (%)'))
+    ))
+    fig_retards_mode.update_layout(
+        title="Taux de Retard par Mode d'Expédition",
+        xaxis_title="Mode",
+        yaxis_title="Taux de Retard (%)",
+        height=400,
+        uirevision='constant'
+    )
+
+    df_retards_region = pd.DataFrame(retards_data['par_region'])
+    df_retards_region['region'] = df_retards_region['region'].astype('category')
+
+    fig_retards_region = go.Figure(go.Bar(
+        x=df_retards_region['region'],
+        y=df_retards_region['taux_retard'],
+        texttemplate='%{y:.1f}%',
+        textposition='outside',
+        marker=dict(color=df_retards_region['taux_retard'], colorscale='Oranges', showscale=True,
+                    colorbar=dict(title='Taux de Retard (%)'))
+    ))
+    fig_retards_region.update_layout(
+        title="Taux de Retard par Région",
+        xaxis_title="Région",
+        yaxis_title="Taux de Retard (%)",
+        height=400,
+        uirevision='constant'
+    )
+
+    df_retards_categorie = pd.DataFrame(retards_data['par_categorie'])
+    df_retards_categorie['categorie'] = df_retards_categorie['categorie'].astype('category')
+
+    fig_retards_cat = px.pie(
+        df_retards_categorie,
+        values='nb_retards',
+        names='categorie',
+        title="Répartition des Retards par Catégorie",
+        height=400
+    )
+    fig_retards_cat.update_layout(uirevision='constant')
+    return fig_retards_mode, fig_retards_region, fig_retards_cat
+
+@st.cache_data(show_spinner=False)
+def construire_figs_perf_mode(perf_mode_data: dict) -> tuple:
+    """🚚 Performance par mode : comparatif 2x2 et compromis délai / marge"""
+    df_perf_mode = ordonner_modes(pd.DataFrame(perf_mode_data['data']))
+
+    fig_perf_compare = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=("CA par Mode", "Nombre de Commandes", "Délai Moyen", "Marge"),
+        specs=[[{"type": "bar"}, {"type": "bar"}],
+               [{"type": "bar"}, {"type": "bar"}]]
+    )
+
+    fig_perf_compare.add_trace(
+        go.Bar(x=df_perf_mode['mode'], y=df_perf_mode['ca'], name='CA', marker_color='#3498db'),
+        row=1, col=1
+    )
+
+    fig_perf_compare.add_trace(
+        go.Bar(x=df_perf_mode['mode'], y=df_perf_mode['nb_commandes'], name='Commandes', marker_color='#2ecc71'),
+        row=1, col=2
+    )
+
+    fig_perf_compare.add_trace(
+        go.Bar(x=df_perf_mode['mode'], y=df_perf_mode['delai_moyen'], name='Délai', marker_color='#e74c3c'),
+        row=2, col=1
+    )
+
+    fig_perf_compare.add_trace(
+        go.Bar(x=df_perf_mode['mode'], y=df_perf_mode['marge_pct'], name='Marge', marker_color='#f39c12'),
+        row=2, col=2
+    )
+
+    fig_perf_compare.update_layout(height=700, showlegend=False, uirevision='constant')
+    fig_perf_compare.update_xaxes(tickangle=-45)
+
+    # Compromis délai / marge : une trace WebGL par mode, bulles proportionnelles au volume (comme la matrice BCG)
+    sizeref_perf = 2.0 * df_perf_mode['nb_commandes'].max() / (20 ** 2) if not df_perf_mode.empty else 1
+    hover_perf = (
+        "<b>%{customdata[0]}</b><br>"
+        "Délai Moyen : %{x:.2f} jours<br>"
+        "Marge : %{y:.2f}%<br>"
+        "CA : %{customdata[1]:,.2f} €<br>"
+        "Profit : %{customdata[2]:,.2f} €<br>"
+        "Nb Commandes : %{customdata[3]}<extra></extra>"
+    )
+    fig_scatter = go.Figure()
+    for (mode, sub), couleur in zip(df_perf_mode.groupby('mode', observed=True), _PLOTLY):
+        fig_scatter.add_trace(go.Scattergl(
+            x=sub['delai_moyen'],
+            y=sub['marge_pct'],
+            mode='markers',
+            name=mode,
+            marker=dict(size=sub['nb_commandes'].to_numpy(), sizemode='area', sizeref=sizeref_perf, color=couleur),
+            customdata=sub[['mode', 'ca', 'profit', 'nb_commandes']].to_numpy(),
+            hovertemplate=hover_perf
+        ))
+    fig_scatter.update_layout(
+        title="Délai Moyen vs Marge (taille = volume)",
+        xaxis_title="Délai Moyen (jours)",
+        yaxis_title="Marge (%)",
+        legend_title_text='Mode',
+        height=500,
+        uirevision='constant'
+    )
+    return fig_perf_compare, fig_scatter
+
+@st.cache_data(show_spinner=False)
+def construire_figs_clv_categories(df_cat_clv: pd.DataFrame) -> tuple:
+    """💰 CLV par catégorie : répartition des clients et CLV totale"""
+    fig_clv_cat = px.pie(
+        regrouper_autres(df_cat_clv, 'categorie', 'nb_clients'),
+        values='nb_clients',
+        names='categorie',
+        title="Répartition des Clients par Catégorie CLV",
+        color='categorie',
+        color_discrete_map=_CLV_COLOR_MAP,
+        height=350
+    )
+    fig_clv_cat.update_layout(uirevision='constant')
+
+    fig_clv_value = px.bar(
+        df_cat_clv,
+        x='categorie',
+        y='clv_total',
+        title="CLV Totale par Catégorie",
+        labels={'clv_total': 'CLV Totale (€)', 'categorie': 'Catégorie'},
+        color='clv_total',
+        color_continuous_scale='Blues',
+        height=350
+    )
+    fig_clv_value.update_layout(uirevision='constant')
+    return fig_clv_cat, fig_clv_value
+
+@st.cache_data(show_spinner=False)
+def construire_fig_clv_top(df_top_clv: pd.DataFrame):
+    """🏆 Top 20 clients par CLV 3 ans"""
+    fig_clv_top = px.bar(
+        df_top_clv,
+        x='clv_3_ans',
+        y='client',
+        orientation='h',
+        title="Top 20 Clients par CLV (3 ans)",
+        labels={'clv_3_ans': 'CLV 3 ans (€)', 'client': 'Client'},
+        color='categorie',
+        color_discrete_map=_CLV_COLOR_MAP,
+        height=600
+    )
+    fig_clv_top.update_layout(yaxis={'categoryorder': 'total ascending'}, uirevision='constant')
+    return fig_clv_top
+
+# === CONTENUS STATIQUES (DATA STORYTELLING) ===
+
+_GABARIT_CARTE = """
+<div class="info-card">
+    <div class="info-title">{titre}</div>
+{corps}
+</div>
+"""
+
+def carte_info(corps: str, titre: str = "Data Storytelling") -> str:
+    """Insère un texte dans le gabarit commun des cartes d'information"""
+    return _GABARIT_CARTE.format(titre=titre, corps=corps.strip("\n"))
+
+def afficher_storytelling(*cartes: str):
+    """Affiche une ou plusieurs cartes statiques en un seul bloc HTML brut (st.html évite le parseur Markdown)"""
+    st.html("".join(cartes))
+
+INFO_CARD_KPI_GLOBAUX = carte_info("""
+    <p>L'entreprise affiche une santé financière solide avec un chiffre d'affaires de 
+    <b>2,3 millions d'euros</b> généré par <b>5 009 commandes</b> auprès de 
+    <b>793 clients</b>, représentant <b>37 873 articles vendus</b>.</p>
+    <p>La <b>marge moyenne de 12,47%</b> et un <b>profit total de 286 397€</b> démontrent 
+    une gestion efficace des coûts. Le <b>panier moyen de 458,61€</b> confirme une 
+    clientèle <b>B2B</b> plutôt que grand public, tandis que la moyenne de 7,56 articles 
+    par commande indique des achats groupés significatifs, typiques d'entreprises s'équipant 
+    en fournitures ou matériel.</p>
+""")
+
+INFO_CARD_BCG = carte_info("""
+    Cette matrice BCG révèle un portefeuille déséquilibré avec 60 produits "Dilemmes" nécessitant des décisions stratégiques urgentes, 
+    contre seulement 20 "Étoiles" à développer et 3 "Vaches à lait" à rentabiliser. Les 17 "Poids morts" devraient être abandonnés 
+    rapidement. 
+    La concentration de produits dans le quadrant "Dilemmes" indique une dispersion des efforts sur trop de 
+    références non rentables, obligeant l'entreprise à choisir lesquelles méritent l'investissement pour 
+    devenir des "Étoiles" et lesquelles éliminer pour libérer des ressources.
+""")
+
+INFO_CARD_MATRICE = carte_info("""
+    L'analyse performance/marge segmente le catalogue en 4 priorités stratégiques : 3 produits 
+    "Priorité à protéger absolument, 6 produits "À optimiser" nécessitant 
+    une renégociation des coûts, 6 produits "À développer" offrant un potentiel 
+    de croissance, et 2 produits "À abandonner". Cette répartition équilibrée entre optimisation et 
+    développement 
+    suggère qu'avec les bonnes actions correctives sur les 6 produits à optimiser, l'entreprise pourrait 
+    significativement améliorer sa rentabilité globale sans compromettre le volume.
+""")
+
+INFO_CARD_FAIBLE_MARGE = carte_info("""
+    20 produits génèrent à peine du profit avec un seuil de marge sous 5%, représentant 259 015€ 
+    de CA (11,28% du total) mais détruisant de la valeur avec 15 références en perte réelle. La ligne rouge de marge affiche des 
+    valeurs négatives catastrophiques (jusqu'à -80%), transformant du 
+    chiffre d'affaires en pertes. Cette situation critique exige une action immédiate : augmenter les prix de 10-15% 
+    sur ces références, renégocier les conditions d'achat, ou supprimer ces produits toxiques qui drainent la 
+    rentabilité globale de l'entreprise.
+""")
+
+INFO_CARD_TOP_PRODUITS = carte_info("""
+    <b>1. Top 10 Produits par Chiffre d’Affaires</b><br>
+    Le Canon imageCLASS 2200 domine largement le chiffre d’affaires (> 60 000€, soit presque 3x
+    plus que le deuxième produit), révélant une forte dépendance à quelques références technologiques, 
+    notamment des copieurs et systèmes de reliure. 
+    Cette concentration souligne le positionnement B2B de l’entreprise, mais suggère aussi un risque de 
+    dépendance et une opportunité de diversification des produits vedettes. <br><br>
+    <b>2. Top 10 Produits par Profit</b><br>
+    Si le Canon imageCLASS reste le plus rentable (~25 000€), son avance est plus modérée, indiquant 
+    une marge plus serrée. À l’inverse, le Fellowes PB500 se distingue par un excellent 
+    ratio profit / chiffre d’affaires, montrant que volume et rentabilité ne coïncident pas 
+    toujours et qu’un arbitrage stratégique est nécessaire. <br><br>
+    <b>3. Top 10 Produits par Quantité</b><br>
+    Les consommables bureautiques (papier, enveloppes, agrafes) dominent les volumes, mais ont 
+    un faible impact sur le chiffre d’affaires. Cette structure révèle un modèle à deux 
+    vitesses : les consommables génèrent récurrence et fidélisation, tandis que les équipements 
+    technologiques portent la rentabilité.
+""")
+
+INFO_CARD_CATEGORIES = carte_info("""
+    La catégorie Technology domine avec 836 000€ de CA et 145 000€ de profit (marge 17,4%).
+    Les Office Supplies suivent avec un CA similaire mais marge comparable, tandis que 
+    Furniture, malgré un CA correct, affiche une marge très faible (2,5%), détruisant 
+    presque la rentabilité.
+    La vraie valeur se situe donc dans Technology et Office Supplies.
+    L’entreprise devrait repenser sa stratégie Furniture : augmenter les prix, réduire les coûts 
+    ou envisager un abandon.
+""")
+
+INFO_CARD_ABC = carte_info("""
+    L'analyse ABC confirme le principe de Pareto : seulement 22,6% des produits génèrent 79,96% du CA, tandis que la Classe B contribue à 15,05% du CA. Le déséquilibre majeur provient de la Classe C : 50,8% des produits ne représentent que 5% du CA, révélant une sur-prolifération du catalogue. Cette répartition impose une action urgente : éliminer 30-50% des références Classe C libérerait des ressources critiques (achats, stockage, merchandising) pour concentrer les efforts sur les 419 produits stratégiques de Classe A qui portent réellement la performance.
+""")
+
+INFO_CARD_PARETO = carte_info("""
+    La courbe de Pareto visualise la concentration extrême du CA : les 50 premiers produits (sur 1 850) génèrent déjà 30% du CA total, formant le coude critique de la courbe. Le premier produit seul pèse environ 60 000€, et les 10 premiers cumulent près de 10% du CA. Cette visualisation confirme qu'un tout petit nombre de références pilote la performance : concentrer les efforts commerciaux, la gestion des stocks et les négociations fournisseurs sur ces 50 produits critiques pourrait maximiser l'efficacité opérationnelle, tandis que les 1 800 autres références mériteraient une gestion plus automatisée et simplifiée.
+""")
+
+INFO_CARD_TEMPOREL = carte_info("""
+    <b>1. Évolution Temporelle par jour</b><br>
+    La vue quotidienne montre une forte volatilité avec des pics jusqu’à 30 000€ certains jours et de
+    longues périodes quasi-nulles. Les gros CA ponctuels proviennent probablement de grosses commandes B2B, 
+    posant un défi de trésorerie et de planification. <br><br>
+    <b>2. Évolution Temporelle par mois</b><br>
+    L’agrégation mensuelle lisse la volatilité et révèle une tendance haussière de 2015 à 2018 : le CA moyen 
+    passe de 40 000€ à plus de 100 000€. Les commandes suivent une progression régulière, confirmant 
+    une croissance soutenue sur 4 ans, avec accélération notable depuis mi-2017. <br><br>
+    <b>3. Évolution Temporelle par année</b><br>
+    La vue annuelle confirme une croissance solide : le CA progresse de 470 000€ à 700 000€ 
+    entre 2015 et 2018, et les commandes de 1 000 à 1 600+. L’ascension constante démontre la solidité du modèle
+    et l’efficacité opérationnelle, avec 2018 comme année record. La question stratégique : comment dépasser le 
+    million d’euros ?
+""")
+
+INFO_CARD_STATS_PERIODE = carte_info("""
+    Le CA moyen mensuel atteint 47 858€ avec 104 commandes moyennes par mois, le pic historique 
+    restant novembre 2018. La croissance moyenne de 40,7% démontre une dynamique exceptionnelle, bien que le pire mois (février 
+    2015) contraste fortement avec cette tendance. 
+""")
+
+INFO_CARD_YOY = carte_info("""
+    L'analyse Year-over-Year montre une croissance volatile mais majoritairement positive : janvier 2016 
+    explose à +160% (effet de base faible), suivie de fluctuations entre -40% et +140%. À partir de 2017, la 
+    croissance se stabilise entre +10% et +90%, avec une tendance haussière marquée. Fin 2018 ralentit légèrement (+20-
+    50%), ce qui est normal après une forte croissance. Cette volatilité en dents de scie suggère des effets 
+    saisonniers ou des variations ponctuelles de commandes importantes, mais la tendance générale reste 
+    solidement positive sur 3 ans.
+""")
+
+INFO_CARD_ETATS = carte_info("""
+    La heatmap révèle une performance par État très contrastée : la Californie (West) domine en taille mais pas en marge, 
+    tout comme Pennsylvania, Texas, Ohio et Illinois (en rouge/orange) qui affichent des marges négatives ou très 
+    faibles malgré des volumes importants. New York, bien que générant du CA, souffre également de rentabilité. A l'inverse, des états peu volumineux ont des marges plutôt élevées.
+    Cette cartographie met en évidence un paradoxe : les plus gros États ne sont pas les plus rentables. 
+    L'entreprise doit investiguer les causes (prix trop bas, coûts logistiques, mix produit défavorable) et 
+    corriger rapidement la situation dans ces États stratégiques pour transformer du volume en profit.
+""")
+
+INFO_CARD_VILLES = carte_info("""
+    604 villes génèrent un CA moyen de 3 803€ par ville, New York City dominant largement avec plus 
+    de 250 000€, soit presque le double de Los Angeles (200 000€). Les régions East et West concentrent les plus grosses villes 
+    performantes, tandis que Central (Houston, Chicago, Detroit) et South (Jacksonville, San Antonio) ont des 
+    contributions plus modestes. Cette concentration géographique sur quelques métropoles majeures révèle un 
+    potentiel inexploité dans les villes moyennes : développer la présence commerciale dans les 580+ villes 
+    à faible CA pourrait doubler le chiffre d'affaires national.
+""")
+
+INFO_CARD_REGIONS = carte_info("""
+    Les régions West et East dominent le chiffre d’affaires (725 000€ et 679 000€), 
+    représentant 55% de l’activité. La répartition des clients reste équilibrée (27,4% West, 26,9% East), 
+    mais le profit par région montre une surperformance de West (108 000€ vs 91 000€).
+    Les régions Central et South, avec une densité de clients similaire mais un CA inférieur, 
+    représentent un potentiel de croissance important si les actions commerciales sont adaptées.
+""", titre="Analyse Géographique – Synthèse")
+
+INFO_CARD_CLIENTS = carte_info("""
+    Avec 98,5 % de clients récurrents, l’entreprise affiche une fidélisation exceptionnelle et 
+    des relations commerciales régulières (6,3 commandes par client).
+    Le faible nombre de nouveaux clients suggère une phase de maturité ou un ralentissement de 
+    l’acquisition.
+    Enfin, la répartition homogène du chiffre d’affaires du top 10 clients indique une 
+    base clients équilibrée, sans dépendance excessive à un compte unique.
+""")
+
+INFO_CARD_SEGMENTS = carte_info("""
+    Le segment Consumer domine largement le chiffre d’affaires (> 1,2 M€), loin devant les 
+    segments Corporate et Home Office.
+    Cependant, les écarts de marge suggèrent que ces segments plus modestes pourraient offrir 
+    une rentabilité ou une stabilité supérieure.
+    Cette structure pose un enjeu stratégique clair : poursuivre la spécialisation Consumer ou 
+    diversifier vers des segments à plus forte valeur ajoutée.
+""")
+
+INFO_CARD_RFM = carte_info("""
+    La segmentation RFM (Récence, Fréquence, Montant) classe les 793 clients selon leur comportement d'achat, révélant une récence moyenne de 147 jours et une fréquence de 6,3 achats pour un montant moyen de 2 897€. Les segments "Fidèles" et "Champions" dominent le CA avec plus de 600 000€ chacun, représentant les clients les plus actifs et généreux. Les "À risque" (18,3% des clients) et "Perdus" (21,6%) nécessitent des actions de reconquête urgentes, tandis que les "Nouveaux" (11,2%) doivent être rapidement convertis en clients réguliers. Cette segmentation actionnable permet de prioriser les efforts marketing : récompenser les Champions, réactiver les clients À risque, et accompagner les Nouveaux vers la fidélisation.
+""")
+
+INFO_CARD_CLV = carte_info("""
+    La CLV moyenne de 11 434€ sur 3 ans (médiane à 2 603€) révèle une forte disparité de valeur client, avec 31,4% des clients "Élevés" représentant 7 millions d'euros cumulés. Cette concentration atteint son paroxysme dans le top 20, dominé par Jenna Caffey, Susan Mackendrick et Theresa Coyne, soit des actifs clients extraordinaires qui, à eux seuls, représentent plus de 15% de la valeur future totale. L'écart brutal avec le reste du top 20 (sous 200 000€) et les 23% de clients à "Faible" CLV crée un double enjeu stratégique : d'une part, la perte d'un seul top 5 client détruirait plusieurs centaines de milliers d'euros de valeur, nécessitant un account management dédié avec contrats pluriannuels et support premium ; d'autre part, l'allocation budgétaire doit impérativement être repensée pour surinvestir dans la rétention des clients à fort potentiel tout en automatisant le service des clients à faible CLV pour préserver la rentabilité globale.
+""")
+
+INFO_CARD_DELAI_RACHAT = carte_info("""
+    Le délai moyen de réachat de 189 jours (médiane 129 jours) sur 4 199 rachats révèle un cycle d'achat relativement long, cohérent avec un modèle B2B de fournitures et équipements. La distribution montre une concentration dans les tranches 90-180 jours (environ 2 000 rachats), suggérant un cycle naturel trimestriel ou semestriel. Cette donnée permet d'optimiser les relances commerciales : contacter proactivement les clients 15-30 jours avant leur date de réachat prévue pourrait améliorer la rétention et prévenir le churn.
+""")
+
+INFO_CARD_RETENTION = carte_info("""
+    L'analyse de cohorte révèle des taux de rétention alarmants : seulement 6,1% des clients rachètent après 1 mois, 8,6% après 3 mois et 10,2% après 6 mois. La matrice par cohorte (12 derniers mois) montre un schéma récurrent de forte attrition : le premier mois (M0) affiche 100% de rétention (vert), puis chute drastiquement à moins de 20% dès M1-M2 (rouge), avec quelques périodes de réactivation sporadiques (jaune-orange). Cette hémorragie de clients nouveaux indique un problème majeur d'onboarding ou d'adéquation produit-marché : moins de 10% des nouveaux clients deviennent récurrents, obligeant à une acquisition constante coûteuse plutôt qu'à capitaliser sur une base fidèle. Des actions d'activation post-première commande sont critiques pour inverser cette tendance.
+""")
+
+INFO_CARD_COMMANDES_PERTE = carte_info("""
+    Sur les 5 009 commandes totales, 1 022 (20,40%) génèrent une perte nette de 66 897€, soit une perte moyenne de 65€ par commande déficitaire. Le top 20 des commandes les plus déficitaires révèle des pertes allant jusqu'à 7 000€ (commande CA-2017-160326), principalement causées par des remises excessives (50-80% de discount en rouge foncé). Cette hémorragie financière concentrée sur quelques transactions catastrophiques indique un manque de contrôle sur les politiques de remise : certaines commandes sont vendues à perte massive, détruisant plusieurs milliers d'euros de marge. L'entreprise doit immédiatement instaurer des seuils d'approbation pour les remises supérieures à 20% et investiguer ces transactions aberrantes pour identifier s'il s'agit d'erreurs commerciales, de tarifications inadaptées ou de clients exploitant les politiques de discount.
+""")
+
+INFO_CARD_REMISES = carte_info("""
+    L'analyse comparative révèle un paradoxe destructeur : 52,64% du CA (1,2M€) bénéficie de remises, générant une marge négative catastrophique de -2,86%, tandis que les ventes sans remise (1,09M€) affichent une marge saine de 29,51%. Les remises supérieures à 20% créent une destruction massive de valeur avec une marge de -40%, et même les tranches 0-5% et 5-10% dégradent significativement la rentabilité (respectivement 29,5% et 16,6% de marge). Cette politique de remise agressive transforme plus de la moitié du CA en activité déficitaire : chaque euro de remise accordée coûte bien plus qu'il ne rapporte. L'entreprise doit radicalement restreindre les remises, interdire tout discount au-delà de 15%, et former les commerciaux à vendre la valeur plutôt que le prix pour restaurer la rentabilité.
+""")
+
+INFO_CARD_COUT_PRIX = carte_info("""
+    Le graphique Prix vs Coût révèle plusieurs produits vendus à perte ou quasi à perte, notamment le Canon imageCLASS (près de 4 000€ de prix pour un coût similaire) et plusieurs systèmes de reliure où le coût dépasse le prix de vente (barres rouges supérieures aux vertes). Ces références toxiques nécessitent une action immédiate : augmentation tarifaire de 15-25%, renégociation des prix d'achat fournisseurs, ou retrait pur et simple du catalogue pour éviter de subventionner les clients avec des produits non rentables.
+""")
+
+INFO_CARD_DELAIS_LIVRAISON = carte_info("""
+    Les délais de livraison moyens et médians s'établissent à 4 jours, avec un minimum de 0 jour (livraison le jour même) et un maximum de 7 jours, démontrant une performance logistique plutôt correcte. L'analyse par mode d'expédition montre que First Class et Second Class offrent les délais les plus courts (2 & 3 jours moyens/médians) après Same day qui est à 0 jours, tandis que Standard Class prend logiquement plus de temps (5 jours). La distribution des délais révèle une forte concentration dans les tranches 2-4 jours et 4-7 jours (environ 4 000 livraisons chacun), avec très peu de retards extrêmes (>7 jours). Par région, Central affiche les délais les plus élevés (4 jours), suggérant des contraintes géographiques ou logistiques. Cette performance opérationnelle satisfaisante constitue un atout compétitif à capitaliser dans la communication client, tout en optimisant la région Central pour homogénéiser le service.
+""")
+
+INFO_CARD_RETARDS = carte_info("""
+    Sur 9 994 livraisons totales, seulement 1 livraison est en retard (0,01%), démontrant une excellence opérationnelle quasi-parfaite. Cette unique livraison tardive provient du mode First Class et de la région East. La totalité des retards provient de la catégorie Office Supplies. Cette performance logistique exceptionnelle constitue un différenciateur majeur face à la concurrence : 99,99% de fiabilité de livraison est un argument commercial puissant qui devrait être mis en avant dans toute la communication, renforçant la confiance client et justifiant potentiellement des prix premium par rapport aux concurrents moins fiables.
+""")
+
+INFO_CARD_PERF_MODE = carte_info("""
+    Standard Class domine massivement avec 1,36M€ de CA et 2 994 commandes, mais génère la marge la plus faible avec un délai de 5 jours, créant un dilemme stratégique visualisé dans le graphique de compromis. First Class, bien que ne représentant que 351 000€ de CA et 787 commandes, affiche la meilleure marge (13,93%) avec le délai le plus rapide après Same Day, démontrant qu'une livraison plus rapide peut être plus rentable. Same Day, malgré son délai minimal, affiche un positionnement intermédiaire peu attractif avec seulement 128 000€, 264 commandes et une marge de 12,38%, ne justifiant pas son coût opérationnel. Cette analyse croisée révèle une opportunité stratégique majeure : migrer progressivement 20-30% des clients Standard Class vers First Class ou Second Class en valorisant la réduction de délai (-2 à -3 jours) contre une légère surcharge tarifaire améliorerait simultanément la marge globale de 1-2 points, la satisfaction client, et l'efficacité opérationnelle, tout en compensant largement les coûts logistiques supplémentaires par une meilleure rentabilité unitaire.
+""")
 
 # === VÉRIFICATION CONNEXION API ===
+# Les valeurs des filtres sont demandées en parallèle de la vérification de connexion
+prechargement_filtres = lancer_en_arriere_plan(charger_valeurs_filtres)
 with st.spinner("🔄 Connexion à l'API..."):
     try:
-        info_api = appeler_api("/")
+        info_api = charger_info_api()
         st.success(f"✅ Connecté à l'API v{info_api['version']} - Dataset : {info_api['nb_lignes']} lignes")
     except:
         st.error(f"❌ L'API n'est pas accessible sur {API_URL}")
@@ -128,12 +1069,15 @@ st.divider()
 
 # === SIDEBAR - FILTRES ===
 st.sidebar.header("🎯 Filtres d'analyse")
-valeurs_filtres = appeler_api("/filters/valeurs")
+try:
+    valeurs_filtres = prechargement_filtres.result()
+except Exception as e:
+    afficher_erreur_api(e)
 
 # Filtres temporels
 st.sidebar.subheader("📅 Période")
-date_min = datetime.strptime(valeurs_filtres['plage_dates']['min'], '%Y-%m-%d')
-date_max = datetime.strptime(valeurs_filtres['plage_dates']['max'], '%Y-%m-%d')
+date_min = valeurs_filtres['date_min']
+date_max = valeurs_filtres['date_max']
 
 col1, col2 = st.sidebar.columns(2)
 with col1:
@@ -159,8 +1103,8 @@ st.sidebar.info("💡 Les graphiques sont interactifs !")
 
 # Paramètres filtres
 params_filtres = {
-    'date_debut': date_debut.strftime('%Y-%m-%d'),
-    'date_fin': date_fin.strftime('%Y-%m-%d')
+    'date_debut': date_debut.isoformat(),
+    'date_fin': date_fin.isoformat()
 }
 if categorie != "Toutes":
     params_filtres['categorie'] = categorie
@@ -202,671 +1146,640 @@ col7, col8, col9 = st.columns(3)
 with col7:
     st.metric("🛒 Panier Moyen", formater_euro(kpi_data['panier_moyen']))
 with col8:
-    articles_cmd = kpi_data['quantite_vendue'] / kpi_data['nb_commandes'] if kpi_data['nb_commandes'] > 0 else 0
-    st.metric("📊 Articles/Commande", f"{articles_cmd:.2f}")
+    st.metric("📊 Articles/Commande", f"{kpi_data['articles_par_commande']:.2f}")
 with col9:
-    ca_par_client = kpi_data['ca_total'] / kpi_data['nb_clients'] if kpi_data['nb_clients'] > 0 else 0
-    st.metric("💎 CA/Client", formater_euro(ca_par_client))
+    st.metric("💎 CA/Client", formater_euro(kpi_data['ca_par_client']))
 
-st.markdown(
-    """
-    <div class="info-card">
-        <div class="info-title">Data Storytelling</div>
-        <p>L'entreprise affiche une santé financière solide avec un chiffre d'affaires de 
-        <b>2,3 millions d'euros</b> généré par <b>5 009 commandes</b> auprès de 
-        <b>793 clients</b>, représentant <b>37 873 articles vendus</b>.</p>
-        <p>La <b>marge moyenne de 12,47%</b> et un <b>profit total de 286 397€</b> démontrent 
-        une gestion efficace des coûts. Le <b>panier moyen de 458,61€</b> confirme une 
-        clientèle <b>B2B</b> plutôt que grand public, tandis que la moyenne de 7,56 articles 
-        par commande indique des achats groupés significatifs, typiques d'entreprises s'équipant 
-        en fournitures ou matériel.</p>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+afficher_storytelling(INFO_CARD_KPI_GLOBAUX)
 st.divider()
 
-# === TABS PRINCIPAUX ===
+# === SECTIONS PRINCIPALES ===
+# Une seule section est exécutée par run : les appels API et les graphiques
+# des sections non affichées ne sont plus calculés.
 st.header("📈 Analyses Détaillées")
-tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
-    "🎯 PRIORITÉS STRATÉGIQUES",
-    "📦 PERFORMANCE PRODUITS & CATÉGORIES",
-    "📅 ÉVOLUTION TEMPORELLE",
-    "🌍 GÉOGRAPHIE",
-    "👥 CLIENTS",
-    "💸 ANALYSE DES PERTES",
-    "🚚 LIVRAISONS"
-])
+st.sidebar.subheader("🧭 Section")
+SECTIONS = {
+    "priorites": "🎯 PRIORITÉS STRATÉGIQUES",
+    "produits": "📦 PERFORMANCE PRODUITS & CATÉGORIES",
+    "temporel": "📅 ÉVOLUTION TEMPORELLE",
+    "geographie": "🌍 GÉOGRAPHIE",
+    "clients": "👥 CLIENTS",
+    "pertes": "💸 ANALYSE DES PERTES",
+    "livraisons": "🚚 LIVRAISONS"
+}
+# La section active est portée par l'URL (?section=...) : lien direct et rechargement conservent la vue
+if "section" not in st.session_state and st.query_params.get("section") in SECTIONS:
+    st.session_state["section"] = st.query_params["section"]
+section = st.sidebar.radio(
+    "Afficher",
+    options=list(SECTIONS),
+    format_func=SECTIONS.get,
+    key="section"
+)
+st.query_params["section"] = section
 
 # =============================================
 # TAB 1 : PRIORITÉS STRATÉGIQUES
 # =============================================
-with tab1:
-    st.markdown("### 🎯 Priorités Stratégiques")
-    st.markdown("*Analyses stratégiques : Matrices BCG et Performance, Produits à faible marge*")
-    st.divider()
-
-    # Sous-tabs pour analyses stratégiques
-    strat_tab1, strat_tab2, strat_tab3 = st.tabs([
-        "📊 Matrice BCG",
-        "🎯 Matrice Performance",
-        "⚠️ Produits Faible Marge"
-    ])
+# --- MATRICE BCG (déplacé depuis ancien Tab1 Produits) ---
+def afficher_bcg():
+    """📊 Sous-onglet Matrice BCG"""
+    st.markdown("#### 📊 Matrice BCG (Boston Consulting Group)")
+    st.markdown("""
+    **Interprétation des quadrants :**
+    - ⭐ **Étoiles** : Part de marché élevée + Croissance forte → Investir
+    - 🐄 **Vaches à lait** : Part de marché élevée + Croissance faible → Rentabiliser
+    - ❓ **Dilemmes** : Part de marché faible + Croissance forte → Décider
+    - 💀 **Poids morts** : Part de marché faible + Croissance faible → Abandonner
+    """)
+
+    bcg_data = appeler_api("/kpi/produits/bcg", params={'limite': 100})
+
+    if "error" not in bcg_data:
+        df_bcg_pos = preparer_df_bcg(bcg_data['data'])
+
+        # Affichage des seuils et répartition
+        col_info1, col_info2, col_info3, col_info4 = st.columns(4)
+        with col_info1:
+            st.metric("⭐ Étoiles", bcg_data['repartition']['etoiles'])
+        with col_info2:
+            st.metric("🐄 Vaches à lait", bcg_data['repartition']['vaches'])
+        with col_info3:
+            st.metric("❓ Dilemmes", bcg_data['repartition']['dilemmes'])
+        with col_info4:
+            st.metric("💀 Poids morts", bcg_data['repartition']['poids_morts'])
+
+        if df_bcg_pos.empty:
+            st.info("ℹ️ Aucun produit à afficher")
+        else:
+            st.plotly_chart(construire_fig_bcg(bcg_data), use_container_width=True)
 
-    # --- MATRICE BCG (déplacé depuis ancien Tab1 Produits) ---
-    with strat_tab1:
-        st.markdown("#### 📊 Matrice BCG (Boston Consulting Group)")
-        st.markdown("""
-        **Interprétation des quadrants :**
-        - ⭐ **Étoiles** : Part de marché élevée + Croissance forte → Investir
-        - 🐄 **Vaches à lait** : Part de marché élevée + Croissance faible → Rentabiliser
-        - ❓ **Dilemmes** : Part de marché faible + Croissance forte → Décider
-        - 💀 **Poids morts** : Part de marché faible + Croissance faible → Abandonner
-        """)
-        
-        bcg_data = appeler_api("/kpi/produits/bcg", params={'limite': 100})
-        
-        if "error" not in bcg_data:
-            df_bcg = pd.DataFrame(bcg_data['data'])
-            
-            # Affichage des seuils et répartition
-            col_info1, col_info2, col_info3, col_info4 = st.columns(4)
-            with col_info1:
-                st.metric("⭐ Étoiles", bcg_data['repartition']['etoiles'])
-            with col_info2:
-                st.metric("🐄 Vaches à lait", bcg_data['repartition']['vaches'])
-            with col_info3:
-                st.metric("❓ Dilemmes", bcg_data['repartition']['dilemmes'])
-            with col_info4:
-                st.metric("💀 Poids morts", bcg_data['repartition']['poids_morts'])
-            
-            # Graphique BCG
-            # Définir les couleurs par quadrant
-            color_map = {
-                "Étoile ⭐": "#28a745",
-                "Vache à lait 🐄": "#007bff", 
-                "Dilemme ❓": "#ffc107",
-                "Poids mort 💀": "#dc3545"
-            }
-            
-            df_bcg['color'] = df_bcg['quadrant'].map(color_map)
-            
-            fig_bcg = px.scatter(
-                df_bcg[df_bcg['ca_actuel'] > 0],
-                x='part_marche',
-                y='croissance',
-                size='ca_actuel',
-                color='quadrant',
-                hover_name='produit',
-                hover_data={
-                    'categorie': True,
-                    'ca_actuel': ':.2f',
-                    'marge_pct': ':.2f',
-                    'part_marche': ':.4f',
-                    'croissance': ':.2f'
-                },
-                color_discrete_map=color_map,
-                title=f"Matrice BCG - {bcg_data['seuils']['annee_precedente']} vs {bcg_data['seuils']['annee_actuelle']}",
-                labels={
-                    'part_marche': 'Part de marché (%)',
-                    'croissance': 'Croissance YoY (%)',
-                    'quadrant': 'Quadrant'
-                },
-                height=600
-            )
-            
-            # Ajouter les lignes de seuil
-            fig_bcg.add_hline(y=10, line_dash="dash", line_color="gray", annotation_text="Seuil croissance (10%)")
-            fig_bcg.add_vline(x=0.5, line_dash="dash", line_color="gray", annotation_text="Seuil part marché (0.5%)")
-            
-            fig_bcg.update_layout(
-                xaxis_type="log",
-                showlegend=True
-            )
-            
-            st.plotly_chart(fig_bcg, use_container_width=True)
-            
             # Tableau détaillé par quadrant
             with st.expander("📋 Détail par quadrant"):
-                quadrant_select = st.selectbox(
-                    "Filtrer par quadrant",
-                    options=["Tous"] + list(df_bcg['quadrant'].unique())
-                )
-                
-                df_display = df_bcg if quadrant_select == "Tous" else df_bcg[df_bcg['quadrant'] == quadrant_select]
-                
-                st.dataframe(
-                    df_display[['produit', 'categorie', 'ca_actuel', 'croissance', 'part_marche', 'marge_pct', 'quadrant']].rename(columns={
-                        'produit': 'Produit',
-                        'categorie': 'Catégorie',
-                        'ca_actuel': 'CA (€)',
-                        'croissance': 'Croissance (%)',
-                        'part_marche': 'Part marché (%)',
-                        'marge_pct': 'Marge (%)',
-                        'quadrant': 'Quadrant'
-                    }),
-                    use_container_width=True,
-                    hide_index=True
-                )
-        else:
-            st.warning("⚠️ Pas assez de données historiques pour la matrice BCG")
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                Cette matrice BCG révèle un portefeuille déséquilibré avec 60 produits "Dilemmes" nécessitant des décisions stratégiques urgentes, 
-                contre seulement 20 "Étoiles" à développer et 3 "Vaches à lait" à rentabiliser. Les 17 "Poids morts" devraient être abandonnés 
-                rapidement. 
-                La concentration de produits dans le quadrant "Dilemmes" indique une dispersion des efforts sur trop de 
-                références non rentables, obligeant l'entreprise à choisir lesquelles méritent l'investissement pour 
-                devenir des "Étoiles" et lesquelles éliminer pour libérer des ressources.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-
-    # --- MATRICE PERFORMANCE CATÉGORIES (déplacé depuis ancien Tab2) ---
-    with strat_tab2:
-        st.markdown("#### 🎯 Matrice Performance/Marge")
-        st.markdown("""
-        **Quadrants stratégiques :**
-        - 🌟 **Q1 - Priorité** : CA élevé + Marge élevée → Investir et développer
-        - ⚙️ **Q2 - À optimiser** : CA élevé + Marge faible → Réduire les coûts
-        - 📈 **Q3 - À développer** : CA faible + Marge élevée → Augmenter visibilité
-        - ❌ **Q4 - À abandonner** : CA faible + Marge faible → Réduire ou arrêter
-        """)
-
-        matrix_data = appeler_api("/kpi/categories/matrix")
-        df_matrix = pd.DataFrame(matrix_data['data'])
-
-        # Répartition
-        rep = matrix_data['repartition']
-        col_q1, col_q2, col_q3, col_q4 = st.columns(4)
-        with col_q1:
-            st.markdown(f"""<div class="quadrant-box quadrant-q1">
-                <h4>🌟 Priorité</h4><h2>{rep['Q1_priorite']}</h2>
-            </div>""", unsafe_allow_html=True)
-        with col_q2:
-            st.markdown(f"""<div class="quadrant-box quadrant-q2">
-                <h4>⚙️ À optimiser</h4><h2>{rep['Q2_optimiser']}</h2>
-            </div>""", unsafe_allow_html=True)
-        with col_q3:
-            st.markdown(f"""<div class="quadrant-box quadrant-q3">
-                <h4>📈 À développer</h4><h2>{rep['Q3_developper']}</h2>
-            </div>""", unsafe_allow_html=True)
-        with col_q4:
-            st.markdown(f"""<div class="quadrant-box quadrant-q4">
-                <h4>❌ À abandonner</h4><h2>{rep['Q4_abandonner']}</h2>
-            </div>""", unsafe_allow_html=True)
-
-        # Graphique scatter
-        color_map_matrix = {
-            "Q1 - Priorité 🌟": "#28a745",
-            "Q2 - À optimiser ⚙️": "#ffc107",
-            "Q3 - À développer 📈": "#007bff",
-            "Q4 - À abandonner ❌": "#dc3545"
-        }
-
-        # Use absolute value of profit for size (scatter size must be non-negative)
-        df_matrix['profit_abs'] = df_matrix['profit'].abs()
-
-        fig_matrix = px.scatter(
-            df_matrix,
-            x='ca',
-            y='marge_pct',
-            size='profit_abs',
-            color='quadrant',
-            hover_name='sous_categorie',
-            hover_data={
-                'categorie': True,
-                'ca': ':.2f',
-                'marge_pct': ':.2f',
-                'profit': ':.2f',
-                'action_recommandee': True
-            },
-            color_discrete_map=color_map_matrix,
-            title="Matrice Performance/Marge par Sous-catégorie",
-            labels={'ca': 'Chiffre d\'affaires (€)', 'marge_pct': 'Marge (%)'},
-            height=550
-        )
-
-        # Lignes de seuil
-        fig_matrix.add_hline(y=matrix_data['seuils']['marge_median'], line_dash="dash", line_color="gray")
-        fig_matrix.add_vline(x=matrix_data['seuils']['ca_median'], line_dash="dash", line_color="gray")
-
-        st.plotly_chart(fig_matrix, use_container_width=True)
-
-        # Tableau avec actions
-        with st.expander("📋 Plan d'action par sous-catégorie"):
+                st.checkbox("Afficher", key="show_bcg_table")
+                if st.session_state.get("show_bcg_table"):
+                    quadrant_select = st.selectbox(
+                        "Filtrer par quadrant",
+                        # Quadrants fixés par le contrat de l'API /kpi/produits/bcg
+                        options=["Tous", *_BCG_COLOR_MAP]
+                    )
+
+                    df_display = df_bcg_pos if quadrant_select == "Tous" else df_bcg_pos[df_bcg_pos['quadrant'] == quadrant_select]
+
+                    st.dataframe(
+                        df_display,
+                        column_order=['produit', 'categorie', 'ca_actuel', 'croissance', 'part_marche', 'marge_pct', 'quadrant'],
+                        column_config={
+                            'produit': st.column_config.TextColumn('Produit'),
+                            'categorie': st.column_config.TextColumn('Catégorie'),
+                            'ca_actuel': st.column_config.NumberColumn('CA (€)', format='%.2f'),
+                            'croissance': st.column_config.NumberColumn('Croissance (%)', format='%.2f'),
+                            'part_marche': st.column_config.NumberColumn('Part marché (%)', format='%.4f'),
+                            'marge_pct': st.column_config.NumberColumn('Marge (%)', format='%.2f'),
+                            'quadrant': st.column_config.TextColumn('Quadrant')
+                        },
+                        use_container_width=True,
+                        hide_index=True
+                    )
+    else:
+        st.warning("⚠️ Pas assez de données historiques pour la matrice BCG")
+
+    afficher_storytelling(INFO_CARD_BCG)
+
+
+# --- MATRICE PERFORMANCE CATÉGORIES (déplacé depuis ancien Tab2) ---
+def afficher_matrice_performance():
+    """🎯 Sous-onglet Matrice Performance"""
+    st.markdown("#### 🎯 Matrice Performance/Marge")
+    st.markdown("""
+    **Quadrants stratégiques :**
+    - 🌟 **Q1 - Priorité** : CA élevé + Marge élevée → Investir et développer
+    - ⚙️ **Q2 - À optimiser** : CA élevé + Marge faible → Réduire les coûts
+    - 📈 **Q3 - À développer** : CA faible + Marge élevée → Augmenter visibilité
+    - ❌ **Q4 - À abandonner** : CA faible + Marge faible → Réduire ou arrêter
+    """)
+
+    matrix_data = appeler_api("/kpi/categories/matrix")
+
+    # Répartition
+    rep = matrix_data['repartition']
+    col_q1, col_q2, col_q3, col_q4 = st.columns(4)
+    with col_q1:
+        st.markdown(f"""<div class="quadrant-box quadrant-q1">
+            <h4>🌟 Priorité</h4><h2>{rep['Q1_priorite']}</h2>
+        </div>""", unsafe_allow_html=True)
+    with col_q2:
+        st.markdown(f"""<div class="quadrant-box quadrant-q2">
+            <h4>⚙️ À optimiser</h4><h2>{rep['Q2_optimiser']}</h2>
+        </div>""", unsafe_allow_html=True)
+    with col_q3:
+        st.markdown(f"""<div class="quadrant-box quadrant-q3">
+            <h4>📈 À développer</h4><h2>{rep['Q3_developper']}</h2>
+        </div>""", unsafe_allow_html=True)
+    with col_q4:
+        st.markdown(f"""<div class="quadrant-box quadrant-q4">
+            <h4>❌ À abandonner</h4><h2>{rep['Q4_abandonner']}</h2>
+        </div>""", unsafe_allow_html=True)
+
+    st.plotly_chart(construire_fig_matrix(matrix_data), use_container_width=True)
+
+    # Tableau avec actions
+    with st.expander("📋 Plan d'action par sous-catégorie"):
+        st.checkbox("Afficher", key="show_matrix_table")
+        if st.session_state.get("show_matrix_table"):
             st.dataframe(
-                df_matrix[['categorie', 'sous_categorie', 'ca', 'marge_pct', 'quadrant', 'action_recommandee']].rename(columns={
-                    'categorie': 'Catégorie',
-                    'sous_categorie': 'Sous-catégorie',
-                    'ca': 'CA (€)',
-                    'marge_pct': 'Marge (%)',
-                    'quadrant': 'Quadrant',
-                    'action_recommandee': 'Action'
-                }),
+                pd.DataFrame(matrix_data['data']),
+                column_order=['categorie', 'sous_categorie', 'ca', 'marge_pct', 'quadrant', 'action_recommandee'],
+                column_config={
+                    'categorie': st.column_config.TextColumn('Catégorie'),
+                    'sous_categorie': st.column_config.TextColumn('Sous-catégorie'),
+                    'ca': st.column_config.NumberColumn('CA (€)', format='%.2f'),
+                    'marge_pct': st.column_config.NumberColumn('Marge (%)', format='%.2f'),
+                    'quadrant': st.column_config.TextColumn('Quadrant'),
+                    'action_recommandee': st.column_config.TextColumn('Action')
+                },
                 use_container_width=True,
                 hide_index=True
             )
-        
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                L'analyse performance/marge segmente le catalogue en 4 priorités stratégiques : 3 produits 
-                "Priorité à protéger absolument, 6 produits "À optimiser" nécessitant 
-                une renégociation des coûts, 6 produits "À développer" offrant un potentiel 
-                de croissance, et 2 produits "À abandonner". Cette répartition équilibrée entre optimisation et 
-                développement 
-                suggère qu'avec les bonnes actions correctives sur les 6 produits à optimiser, l'entreprise pourrait 
-                significativement améliorer sa rentabilité globale sans compromettre le volume.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
 
-    # --- PRODUITS FAIBLE MARGE (déplacé depuis ancien Tab1) ---
-    with strat_tab3:
-        st.markdown("### ⚠️ Produits à Faible Marge")
-        st.markdown("*Produits qui génèrent du CA mais peu de profit - À optimiser ou abandonner*")
-        
+    afficher_storytelling(INFO_CARD_MATRICE)
+
+
+# --- PRODUITS FAIBLE MARGE (déplacé depuis ancien Tab1) ---
+def afficher_faible_marge():
+    """⚠️ Sous-onglet Produits Faible Marge"""
+    st.markdown("### ⚠️ Produits à Faible Marge")
+    st.markdown("*Produits qui génèrent du CA mais peu de profit - À optimiser ou abandonner*")
+
+    # Formulaire : l'API n'est rappelée qu'à la validation, pas à chaque mouvement de slider
+    with st.form("fm_params"):
         col_seuil, col_limite = st.columns([1, 1])
         with col_seuil:
             seuil_marge = st.slider("Seuil de marge (%)", 0.0, 20.0, 5.0, 0.5)
         with col_limite:
             nb_produits_fm = st.slider("Nombre de produits", 10, 50, 20)
-        
-        faible_marge_data = appeler_api("/kpi/produits/faible-marge", params={'seuil_marge': seuil_marge, 'limite': nb_produits_fm})
-        
-        # Statistiques
-        stats = faible_marge_data['statistiques']
-        col_s1, col_s2, col_s3, col_s4 = st.columns(4)
-        with col_s1:
-            st.metric("Nb produits", stats['nb_produits_faible_marge'])
-        with col_s2:
-            st.metric("CA concerné", formater_euro(stats['ca_total_faible_marge']))
-        with col_s3:
-            st.metric("% CA total", f"{stats['pct_ca_total']}%")
-        with col_s4:
-            st.metric("🔴 En perte", stats['nb_produits_perte'])
-        
-        df_fm = pd.DataFrame(faible_marge_data['data'])
-        
-        if len(df_fm) > 0:
-            # Graphique double axe : CA vs Marge
-            fig_fm = make_subplots(specs=[[{"secondary_y": True}]])
-            
-            fig_fm.add_trace(
-                go.Bar(
-                    name='CA',
-                    x=df_fm['produit'].str[:30] + '...',
-                    y=df_fm['ca'],
-                    marker_color='#3498db',
-                    text=df_fm['ca'].apply(lambda x: f"{x:,.0f}€"),
-                    textposition='outside'
-                ),
-                secondary_y=False
-            )
-            
-            fig_fm.add_trace(
-                go.Scatter(
-                    name='Marge %',
-                    x=df_fm['produit'].str[:30] + '...',
-                    y=df_fm['marge_pct'],
-                    mode='lines+markers',
-                    line=dict(color='#e74c3c', width=3),
-                    marker=dict(size=10)
-                ),
-                secondary_y=True
-            )
-            
-            fig_fm.update_layout(
-                title="Produits à faible marge : CA vs Marge",
-                height=500,
-                xaxis_tickangle=-45
-            )
-            fig_fm.update_yaxes(title_text="CA (€)", secondary_y=False)
-            fig_fm.update_yaxes(title_text="Marge (%)", secondary_y=True)
-            
-            st.plotly_chart(fig_fm, use_container_width=True)
-            
-            # Tableau avec indicateur de rotation
-            with st.expander("📋 Tableau détaillé avec rotation des stocks"):
+        st.form_submit_button("Appliquer")
+
+    faible_marge_data = appeler_api("/kpi/produits/faible-marge", params={'seuil_marge': seuil_marge, 'limite': nb_produits_fm})
+
+    # Statistiques
+    stats = faible_marge_data['statistiques']
+    col_s1, col_s2, col_s3, col_s4 = st.columns(4)
+    with col_s1:
+        st.metric("Nb produits", stats['nb_produits_faible_marge'])
+    with col_s2:
+        st.metric("CA concerné", formater_euro(stats['ca_total_faible_marge']))
+    with col_s3:
+        st.metric("% CA total", f"{stats['pct_ca_total']}%")
+    with col_s4:
+        st.metric("🔴 En perte", stats['nb_produits_perte'])
+
+    df_fm = pd.DataFrame(faible_marge_data['data'])
+
+    if len(df_fm) > 0:
+        st.plotly_chart(construire_fig_faible_marge(faible_marge_data), use_container_width=True)
+
+        # Tableau avec indicateur de rotation
+        with st.expander("📋 Tableau détaillé avec rotation des stocks"):
+            st.checkbox("Afficher", key="show_fm_table")
+            if st.session_state.get("show_fm_table"):
                 st.dataframe(
-                    df_fm[['produit', 'categorie', 'ca', 'profit', 'marge_pct', 'discount_moyen', 'rotation', 'alerte']].rename(columns={
-                        'produit': 'Produit',
-                        'categorie': 'Catégorie',
-                        'ca': 'CA (€)',
-                        'profit': 'Profit (€)',
-                        'marge_pct': 'Marge (%)',
-                        'discount_moyen': 'Discount moy (%)',
-                        'rotation': 'Rotation',
-                        'alerte': 'Alerte'
-                    }),
+                    df_fm,
+                    column_order=['produit', 'categorie', 'ca', 'profit', 'marge_pct', 'discount_moyen', 'rotation', 'alerte'],
+                    column_config={
+                        'produit': st.column_config.TextColumn('Produit'),
+                        'categorie': st.column_config.TextColumn('Catégorie'),
+                        'ca': st.column_config.NumberColumn('CA (€)', format='%.2f'),
+                        'profit': st.column_config.NumberColumn('Profit (€)', format='%.2f'),
+                        'marge_pct': st.column_config.NumberColumn('Marge (%)', format='%.2f'),
+                        'discount_moyen': st.column_config.NumberColumn('Discount moy (%)', format='%.2f'),
+                        'rotation': st.column_config.NumberColumn('Rotation', format='%.4f'),
+                        'alerte': st.column_config.TextColumn('Alerte')
+                    },
                     use_container_width=True,
                     hide_index=True
                 )
-        
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                20 produits génèrent à peine du profit avec un seuil de marge sous 5%, représentant 259 015€ 
-                de CA (11,28% du total) mais détruisant de la valeur avec 15 références en perte réelle. La ligne rouge de marge affiche des 
-                valeurs négatives catastrophiques (jusqu'à -80%), transformant du 
-                chiffre d'affaires en pertes. Cette situation critique exige une action immédiate : augmenter les prix de 10-15% 
-                sur ces références, renégocier les conditions d'achat, ou supprimer ces produits toxiques qui drainent la 
-                rentabilité globale de l'entreprise.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+
+    afficher_storytelling(INFO_CARD_FAIBLE_MARGE)
+
+
+@st.fragment
+def afficher_priorites():
+    """🎯 Onglet Priorités stratégiques"""
+    st.markdown("### 🎯 Priorités Stratégiques")
+    st.markdown("*Analyses stratégiques : Matrices BCG et Performance, Produits à faible marge*")
+    st.divider()
+
+    # Sous-onglets : seul le sous-onglet sélectionné est exécuté
+    sous_onglets = {
+        "📊 Matrice BCG": afficher_bcg,
+        "🎯 Matrice Performance": afficher_matrice_performance,
+        "⚠️ Produits Faible Marge": afficher_faible_marge
+    }
+    vue = st.radio(
+        "Analyse stratégique",
+        options=list(sous_onglets),
+        horizontal=True,
+        label_visibility="collapsed",
+        key="strat_vue"
+    )
+    sous_onglets[vue]()
+
 
 # =============================================
 # TAB 2 : PERFORMANCE PRODUITS & CATÉGORIES
 # =============================================
-with tab2:
-    st.markdown("### 📦 Performance Produits & Catégories")
-    st.markdown("*Analyses opérationnelles détaillées des produits et catégories*")
-    st.divider()
+# --- TOP PRODUITS ---
+@st.fragment
+def afficher_top_produits():
+    """🏆 Sous-onglet Top produits"""
+    st.markdown("#### 🏆 Top Produits")
+
+    col_tri, col_nb = st.columns([3, 1])
+    with col_tri:
+        # segmented_control renvoie None si l'option active est désélectionnée
+        critere_tri = st.segmented_control(
+            "Trier par",
+            options=['ca', 'profit', 'quantite'],
+            format_func=lambda x: {'ca': '💰 CA', 'profit': '💵 Profit', 'quantite': '📦 Quantité'}[x],
+            default='ca'
+        ) or 'ca'
+    with col_nb:
+        nb_produits = st.number_input("Afficher", min_value=5, max_value=50, value=10, step=5)
+
+    df_produits = charger_df_arrow("/kpi/produits/top", params={'limite': nb_produits, 'tri_par': critere_tri})
+    df_produits['categorie'] = df_produits['categorie'].astype('category')
+
+    # Copie de la structure mise en cache : seules les traces et le titre changent
+    fig_produits = go.Figure(_base_fig_produits(critere_tri))
+    for categorie in df_produits['categorie'].cat.categories:
+        sub = df_produits[df_produits['categorie'] == categorie]
+        fig_produits.add_trace(go.Bar(
+            x=sub[critere_tri],
+            y=sub['produit'],
+            orientation='h',
+            name=categorie,
+            marker_color=_CAT_COLOR_MAP[categorie],
+            hovertemplate="%{y}<br>%{x:,.2f}<extra>" + categorie + "</extra>"
+        ))
+    fig_produits.update_layout(title=f"Top {nb_produits} Produits")
+    st.plotly_chart(fig_produits, use_container_width=True, key='fig_produits')
+
+    afficher_storytelling(INFO_CARD_TOP_PRODUITS)
+
+
+# --- VUE CATÉGORIES ---
+@st.fragment
+def afficher_vue_categories():
+    """📊 Sous-onglet Vue catégories"""
+    df_cat = charger_df("/kpi/categories")
+
+    # Une seule figure à deux sous-graphiques : layout et template ne sont envoyés qu'une fois
+    fig_categories = make_subplots(rows=1, cols=2, subplot_titles=("CA et Profit par Catégorie", "Marge par Catégorie (%)"))
+    fig_categories.add_trace(go.Bar(name='CA', x=df_cat['categorie'], y=df_cat['ca'], marker_color='#667eea'), row=1, col=1)
+    fig_categories.add_trace(go.Bar(name='Profit', x=df_cat['categorie'], y=df_cat['profit'], marker_color='#764ba2'), row=1, col=1)
+    fig_categories.add_trace(
+        go.Bar(
+            name='Marge (%)', x=df_cat['categorie'], y=df_cat['marge_pct'],
+            marker=dict(color=df_cat['marge_pct'], colorscale='Viridis'),
+            texttemplate='%{y:.2f}%', textposition='outside', showlegend=False
+        ),
+        row=1, col=2
+    )
+    fig_categories.update_layout(barmode='group', height=400, uirevision='constant')
+    st.plotly_chart(fig_categories, use_container_width=True, key='fig_categories')
+
+    afficher_storytelling(INFO_CARD_CATEGORIES)
+
+
+# --- ANALYSE ABC (PARETO) ---
+@st.fragment
+def afficher_analyse_abc():
+    """📊 Sous-onglet Analyse ABC (Pareto)"""
+    st.markdown("#### 📊 Analyse ABC (Pareto)")
+    st.markdown("""
+    **Principe de Pareto (80/20) :**
+    - 🌟 **Classe A** : Éléments générant 80% du CA (priorité maximale)
+    - 📊 **Classe B** : Éléments générant 15% du CA (importance moyenne)
+    - 📉 **Classe C** : Éléments générant 5% du CA (faible importance)
+    """)
+
+    niveau_abc = st.segmented_control(
+        "Niveau d'analyse",
+        options=['produit', 'categorie', 'client'],
+        format_func=lambda x: {'produit': '📦 Par Produit', 'categorie': '📂 Par Catégorie', 'client': '👥 Par Client'}[x],
+        default='produit'
+    ) or 'produit'
+
+    # Le slider de Pareto plafonne à 100 éléments : inutile de rapatrier le reste
+    abc_data = appeler_api("/kpi/analyse-abc", params={'niveau': niveau_abc, 'top': 100})
+
+    # Statistiques globales
+    stats_abc = abc_data['statistiques']
+    col_abc1, col_abc2 = st.columns(2)
+    with col_abc1:
+        st.metric("📊 Total Éléments", formater_nombre(stats_abc['total_elements']))
+    with col_abc2:
+        st.metric("💰 CA Total", formater_euro(stats_abc['ca_total']))
 
-    perf_tab1, perf_tab2, perf_tab3 = st.tabs(["🏆 Top Produits", "📊 Vue Catégories", "📊 Analyse ABC (Pareto)"])
+    st.divider()
 
-    # --- TOP PRODUITS ---
-    with perf_tab1:
-        st.markdown("#### 🏆 Top Produits")
-
-        col_tri, col_nb = st.columns([3, 1])
-        with col_tri:
-            critere_tri = st.radio(
-                "Trier par",
-                options=['ca', 'profit', 'quantite'],
-                format_func=lambda x: {'ca': '💰 CA', 'profit': '💵 Profit', 'quantite': '📦 Quantité'}[x],
-                horizontal=True
-            )
-        with col_nb:
-            nb_produits = st.number_input("Afficher", min_value=5, max_value=50, value=10, step=5)
+    # Statistiques par classe
+    df_classes = pd.DataFrame(abc_data['par_classe'])
 
-        top_produits = appeler_api("/kpi/produits/top", params={'limite': nb_produits, 'tri_par': critere_tri})
-        df_produits = pd.DataFrame(top_produits)
+    col_classe1, col_classe2 = st.columns(2)
 
-        fig_produits = px.bar(
-            df_produits,
-            x=critere_tri,
-            y='produit',
-            color='categorie',
-            orientation='h',
-            title=f"Top {nb_produits} Produits",
-            labels={'ca': 'CA (€)', 'profit': 'Profit (€)', 'quantite': 'Quantité', 'produit': 'Produit'},
-            color_discrete_sequence=px.colors.qualitative.Set2,
-            height=500
+    with col_classe1:
+        fig_abc_pie = px.pie(
+            df_classes,
+            values='nombre',
+            names='classe',
+            title="Répartition du Nombre d'Éléments par Classe",
+            color='classe',  # Utiliser color au lieu de color_discrete_sequence
+            color_discrete_map=_ABC_COLOR_MAP,
+            height=350
         )
-        fig_produits.update_layout(yaxis={'categoryorder':'total ascending'})
-        st.plotly_chart(fig_produits, use_container_width=True)
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                <b>1. Top 10 Produits par Chiffre d’Affaires</b><br>
-                Le Canon imageCLASS 2200 domine largement le chiffre d’affaires (> 60 000€, soit presque 3x
-                plus que le deuxième produit), révélant une forte dépendance à quelques références technologiques, 
-                notamment des copieurs et systèmes de reliure. 
-                Cette concentration souligne le positionnement B2B de l’entreprise, mais suggère aussi un risque de 
-                dépendance et une opportunité de diversification des produits vedettes. <br><br>
-                <b>2. Top 10 Produits par Profit</b><br>
-                Si le Canon imageCLASS reste le plus rentable (~25 000€), son avance est plus modérée, indiquant 
-                une marge plus serrée. À l’inverse, le Fellowes PB500 se distingue par un excellent 
-                ratio profit / chiffre d’affaires, montrant que volume et rentabilité ne coïncident pas 
-                toujours et qu’un arbitrage stratégique est nécessaire. <br><br>
-                <b>3. Top 10 Produits par Quantité</b><br>
-                Les consommables bureautiques (papier, enveloppes, agrafes) dominent les volumes, mais ont 
-                un faible impact sur le chiffre d’affaires. Cette structure révèle un modèle à deux 
-                vitesses : les consommables génèrent récurrence et fidélisation, tandis que les équipements 
-                technologiques portent la rentabilité.
-                </div>
-            """,
-            unsafe_allow_html=True
+        fig_abc_pie.update_layout(uirevision='constant')
+        st.plotly_chart(fig_abc_pie, use_container_width=True, key='fig_abc_pie')
+
+    with col_classe2:
+        fig_abc_ca = px.bar(
+            df_classes,
+            x='classe',
+            y='pct_ca',
+            title="% CA par Classe",
+            labels={'pct_ca': '% CA', 'classe': 'Classe'},
+            text='pct_ca',
+            color='classe',
+            color_discrete_map=_ABC_COLOR_MAP,
+            height=350
         )
+        fig_abc_ca.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+        fig_abc_ca.update_layout(uirevision='constant')
+        st.plotly_chart(fig_abc_ca, use_container_width=True, key='fig_abc_ca')
+
+    # Tableau des statistiques par classe
+    st.markdown("#### 📋 Détail par Classe")
+    st.dataframe(
+        df_classes,
+        column_order=['classe', 'nombre', 'pct_nombre', 'ca_total', 'pct_ca', 'profit_total'],
+        column_config={
+            'classe': st.column_config.TextColumn('Classe'),
+            'nombre': st.column_config.NumberColumn('Nombre', format='%d'),
+            'pct_nombre': st.column_config.NumberColumn('% Nombre', format='%.2f'),
+            'ca_total': st.column_config.NumberColumn('CA Total (€)', format='%.2f'),
+            'pct_ca': st.column_config.NumberColumn('% CA', format='%.2f'),
+            'profit_total': st.column_config.NumberColumn('Profit Total (€)', format='%.2f')
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+
+    afficher_storytelling(INFO_CARD_ABC)
 
-    # --- VUE CATÉGORIES ---
-    with perf_tab2:
-        categories = appeler_api("/kpi/categories")
-        df_cat = pd.DataFrame(categories)
-
-        col_left, col_right = st.columns(2)
-
-        with col_left:
-            fig_cat = go.Figure()
-            fig_cat.add_trace(go.Bar(name='CA', x=df_cat['categorie'], y=df_cat['ca'], marker_color='#667eea'))
-            fig_cat.add_trace(go.Bar(name='Profit', x=df_cat['categorie'], y=df_cat['profit'], marker_color='#764ba2'))
-            fig_cat.update_layout(title="CA et Profit par Catégorie", barmode='group', height=400)
-            st.plotly_chart(fig_cat, use_container_width=True)
-
-        with col_right:
-            fig_marge = px.bar(df_cat, x='categorie', y='marge_pct', title="Marge par Catégorie (%)",
-                              color='marge_pct', color_continuous_scale='Viridis', text='marge_pct', height=400)
-            fig_marge.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
-            st.plotly_chart(fig_marge, use_container_width=True)
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                La catégorie Technology domine avec 836 000€ de CA et 145 000€ de profit (marge 17,4%).
-                Les Office Supplies suivent avec un CA similaire mais marge comparable, tandis que 
-                Furniture, malgré un CA correct, affiche une marge très faible (2,5%), détruisant 
-                presque la rentabilité.
-                La vraie valeur se situe donc dans Technology et Office Supplies.
-                L’entreprise devrait repenser sa stratégie Furniture : augmenter les prix, réduire les coûts 
-                ou envisager un abandon.
-                </div>
-            """,
-            unsafe_allow_html=True
+    st.divider()
+
+    # Courbe de Pareto
+    st.markdown("#### 📈 Courbe de Pareto (% cumulé du CA)")
+    df_abc_full = charger_df("/kpi/analyse-abc", params={'niveau': niveau_abc, 'top': 100}, cle='data')
+
+    # Ajuster les paramètres du slider en fonction du nombre d'éléments
+    nb_elements = stats_abc['total_elements']
+
+    # Définir min et max de manière adaptative
+    if nb_elements <= 10:
+        # Si très peu d'éléments, afficher tous sans slider
+        nb_affichage = nb_elements
+        st.info(f"Affichage des {nb_elements} éléments disponibles")
+    else:
+        # Sinon, afficher un slider avec des valeurs cohérentes
+        min_slider = min(10, nb_elements)
+        max_slider = min(100, nb_elements)
+        default_slider = min(50, nb_elements)
+
+        nb_affichage = st.slider(
+            "Nombre d'éléments à afficher", 
+            min_slider, 
+            max_slider, 
+            default_slider, 
+            key="abc_pareto"
         )
 
-    # --- ANALYSE ABC (PARETO) ---
-    with perf_tab3:
-        st.markdown("#### 📊 Analyse ABC (Pareto)")
-        st.markdown("""
-        **Principe de Pareto (80/20) :**
-        - 🌟 **Classe A** : Éléments générant 80% du CA (priorité maximale)
-        - 📊 **Classe B** : Éléments générant 15% du CA (importance moyenne)
-        - 📉 **Classe C** : Éléments générant 5% du CA (faible importance)
-        """)
-
-        niveau_abc = st.radio(
-            "Niveau d'analyse",
-            options=['produit', 'categorie', 'client'],
-            format_func=lambda x: {'produit': '📦 Par Produit', 'categorie': '📂 Par Catégorie', 'client': '👥 Par Client'}[x],
-            horizontal=True
+    df_abc_display = df_abc_full.head(nb_affichage)
+    # Rangs partagés par les deux traces (tableau NumPy sérialisé en binaire par Plotly)
+    x_rang = np.arange(1, len(df_abc_display) + 1, dtype=np.int32)
+
+    fig_pareto = make_subplots(specs=[[{"secondary_y": True}]])
+    fig_pareto.add_trace(
+        go.Bar(
+            name='CA',
+            x=x_rang,
+            y=df_abc_display['ca'].to_numpy(),
+            marker_color='#3498db'
+        ),
+        secondary_y=False
+    )
+    fig_pareto.add_trace(
+        go.Scattergl(
+            name='% Cumulé',
+            x=x_rang,
+            y=df_abc_display['pct_cumul'].to_numpy(),
+            mode='lines+markers',
+            line=dict(color='#e74c3c', width=3),
+            marker=dict(size=8)
+        ),
+        secondary_y=True
+    )
+
+    # Ajouter ligne 80%
+    fig_pareto.add_hline(y=80, line_dash="dash", line_color="green", annotation_text="80%", secondary_y=True)
+    fig_pareto.update_layout(
+        title="Courbe de Pareto",
+        height=500,
+        uirevision='constant'
+    )
+    fig_pareto.update_xaxes(title_text="Rang (du plus important au moins important)")
+    fig_pareto.update_yaxes(title_text="CA (€)", secondary_y=False)
+    fig_pareto.update_yaxes(title_text="% CA Cumulé", secondary_y=True, range=[0, 105])
+    st.plotly_chart(fig_pareto, use_container_width=True, key='fig_pareto')
+
+    # Tableau détaillé avec filtrage par classe
+    with st.expander("📋 Tableau détaillé des variations"):
+        st.markdown("#### 📋 Tableau Détaillé")
+
+        classe_filter = st.selectbox(
+            "Filtrer par classe",
+            options=["Toutes", *_ABC_COLOR_MAP],
+            key="abc_filter"
         )
 
-        abc_data = appeler_api("/kpi/analyse-abc", params={'niveau': niveau_abc})
+        if classe_filter == 'Toutes':
+            df_abc_filtered = df_abc_full  # Déjà limité à 100 pour performance
+        else:
+            # Filtrage côté API : seuls les 100 premiers éléments de la classe sont transférés
+            df_abc_filtered = charger_df(
+                "/kpi/analyse-abc",
+                params={'niveau': niveau_abc, 'classe': classe_filter[0], 'top': 100},
+                cle='data'
+            )
 
-        # Définir le mapping de couleurs cohérent
-        COLOR_MAP_ABC = {
-            "A 🌟": "#28a745",  # Vert
-            "B 📊": "#ffc107",  # Jaune
-            "C 📉": "#dc3545"   # Rouge
-        }
+        st.dataframe(
+            df_abc_filtered,
+            column_order=['nom', 'categorie', 'ca', 'profit', 'pct_ca', 'pct_cumul', 'classe'],
+            column_config={
+                'nom': st.column_config.TextColumn('Nom'),
+                'categorie': st.column_config.TextColumn('Catégorie'),
+                'ca': st.column_config.NumberColumn('CA (€)', format='%.2f'),
+                'profit': st.column_config.NumberColumn('Profit (€)', format='%.2f'),
+                'pct_ca': st.column_config.NumberColumn('% CA', format='%.2f'),
+                'pct_cumul': st.column_config.NumberColumn('% Cumulé', format='%.2f'),
+                'classe': st.column_config.TextColumn('Classe')
+            },
+            use_container_width=True,
+            hide_index=True
+        ) 
 
-        # Statistiques globales
-        stats_abc = abc_data['statistiques']
-        col_abc1, col_abc2 = st.columns(2)
-        with col_abc1:
-            st.metric("📊 Total Éléments", formater_nombre(stats_abc['total_elements']))
-        with col_abc2:
-            st.metric("💰 CA Total", formater_euro(stats_abc['ca_total']))
+    afficher_storytelling(INFO_CARD_PARETO)
 
-        st.divider()
 
-        # Statistiques par classe
-        df_classes = pd.DataFrame(abc_data['par_classe'])
+def afficher_produits_categories():
+    """📦 Onglet Performance produits & catégories"""
+    st.markdown("### 📦 Performance Produits & Catégories")
+    st.markdown("*Analyses opérationnelles détaillées des produits et catégories*")
+    st.divider()
 
-        col_classe1, col_classe2 = st.columns(2)
+    perf_tab1, perf_tab2, perf_tab3 = st.tabs(["🏆 Top Produits", "📊 Vue Catégories", "📊 Analyse ABC (Pareto)"])
 
-        with col_classe1:
-            fig_abc_pie = px.pie(
-                df_classes,
-                values='nombre',
-                names='classe',
-                title="Répartition du Nombre d'Éléments par Classe",
-                color='classe',  # Utiliser color au lieu de color_discrete_sequence
-                color_discrete_map=COLOR_MAP_ABC,  # Utiliser le même mapping
-                height=350
-            )
-            st.plotly_chart(fig_abc_pie, use_container_width=True)
-
-        with col_classe2:
-            fig_abc_ca = px.bar(
-                df_classes,
-                x='classe',
-                y='pct_ca',
-                title="% CA par Classe",
-                labels={'pct_ca': '% CA', 'classe': 'Classe'},
-                text='pct_ca',
-                color='classe',
-                color_discrete_map=COLOR_MAP_ABC,  # Utiliser le même mapping
-                height=350
-            )
-            fig_abc_ca.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-            st.plotly_chart(fig_abc_ca, use_container_width=True)
+    # --- TOP PRODUITS ---
+    with perf_tab1:
+        afficher_top_produits()
 
-        # Tableau des statistiques par classe
-        st.markdown("#### 📋 Détail par Classe")
-        st.dataframe(
-            df_classes[['classe', 'nombre', 'pct_nombre', 'ca_total', 'pct_ca', 'profit_total']].rename(columns={
-                'classe': 'Classe',
-                'nombre': 'Nombre',
-                'pct_nombre': '% Nombre',
-                'ca_total': 'CA Total (€)',
-                'pct_ca': '% CA',
-                'profit_total': 'Profit Total (€)'
-            }),
-            use_container_width=True,
-            hide_index=True
-        )
+    # --- VUE CATÉGORIES ---
+    with perf_tab2:
+        afficher_vue_categories()
 
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                L'analyse ABC confirme le principe de Pareto : seulement 22,6% des produits génèrent 79,96% du CA, tandis que la Classe B contribue à 15,05% du CA. Le déséquilibre majeur provient de la Classe C : 50,8% des produits ne représentent que 5% du CA, révélant une sur-prolifération du catalogue. Cette répartition impose une action urgente : éliminer 30-50% des références Classe C libérerait des ressources critiques (achats, stockage, merchandising) pour concentrer les efforts sur les 419 produits stratégiques de Classe A qui portent réellement la performance.
-                </div>
-            """,
-            unsafe_allow_html=True
-        )
+    # --- ANALYSE ABC (PARETO) ---
+    with perf_tab3:
+        afficher_analyse_abc()
 
-        st.divider()
 
-        # Courbe de Pareto
-        st.markdown("#### 📈 Courbe de Pareto (% cumulé du CA)")
-        df_abc_full = pd.DataFrame(abc_data['data'])
-        
-        # Ajuster les paramètres du slider en fonction du nombre d'éléments
-        nb_elements = len(df_abc_full)
-        
-        # Définir min et max de manière adaptative
-        if nb_elements <= 10:
-            # Si très peu d'éléments, afficher tous sans slider
-            nb_affichage = nb_elements
-            st.info(f"Affichage des {nb_elements} éléments disponibles")
-        else:
-            # Sinon, afficher un slider avec des valeurs cohérentes
-            min_slider = min(10, nb_elements)
-            max_slider = min(100, nb_elements)
-            default_slider = min(50, nb_elements)
-            
-            nb_affichage = st.slider(
-                "Nombre d'éléments à afficher", 
-                min_slider, 
-                max_slider, 
-                default_slider, 
-                key="abc_pareto"
-            )
-        
-        df_abc_display = df_abc_full.head(nb_affichage)
-        
-        fig_pareto = make_subplots(specs=[[{"secondary_y": True}]])
-        fig_pareto.add_trace(
-            go.Bar(
-                name='CA',
-                x=list(range(1, len(df_abc_display) + 1)),
-                y=df_abc_display['ca'],
-                marker_color='#3498db'
-            ),
-            secondary_y=False
-        )
-        fig_pareto.add_trace(
-            go.Scatter(
-                name='% Cumulé',
-                x=list(range(1, len(df_abc_display) + 1)),
-                y=df_abc_display['pct_cumul'],
-                mode='lines+markers',
-                line=dict(color='#e74c3c', width=3),
-                marker=dict(size=8)
-            ),
-            secondary_y=True
-        )
+# =============================================
+# TAB 3 : ÉVOLUTION TEMPORELLE
+# =============================================
+# --- SOUS-ONGLET 1 : ÉVOLUTION CA ET PROFIT ---
+@st.fragment
+def afficher_evolution_ca():
+    """📈 Sous-onglet Évolution du CA et Profit"""
+    st.markdown("#### 📊 Évolution du CA, Profit et Commandes")
+
+    granularite = st.segmented_control(
+        "Période d'analyse",
+        options=['jour', 'mois', 'annee'],
+        format_func=lambda x: {'jour': '📅 Par jour', 'mois': '📊 Par mois', 'annee': '📈 Par année'}[x],
+        default='jour'
+    ) or 'jour'
+
+    df_temporal = serie_temporelle(granularite)
+
+    # Courbes journalières longues réduites par LTTB, chacune sur son propre échantillonnage ;
+    # les barres de commandes gardent tous les jours (les vues mois/année restent intactes)
+    df_ca = df_temporal.iloc[indices_lttb(df_temporal['ca'])]
+    df_profit = df_temporal.iloc[indices_lttb(df_temporal['profit'])]
+
+    # Copie du graphique pré-construit : seules les données des traces changent
+    fig_temporal = go.Figure(_squelette_temporel(granularite == 'jour'))
+    fig_temporal.data[0].update(x=df_ca['periode'], y=df_ca['ca'])
+    fig_temporal.data[1].update(x=df_profit['periode'], y=df_profit['profit'])
+    fig_temporal.data[2].update(x=df_temporal['periode'], y=df_temporal['nb_commandes'])
+
+    st.plotly_chart(fig_temporal, use_container_width=True, key='fig_temporal')
+
+    afficher_storytelling(INFO_CARD_TEMPOREL)
+
+
+# --- SOUS-ONGLET 2 : INDICATEURS CLÉS PAR PÉRIODE ---
+def afficher_indicateurs_periode():
+    """📊 Sous-onglet Indicateurs clés par période"""
+    st.markdown("#### 📊 Statistiques et Tendances par Période")
+
+    # Statistiques pré-calculées par l'API (agrégation mensuelle)
+    temporal_avance = appeler_api("/kpi/temporel/avance")
+    stats_temp = temporal_avance['statistiques']
+
+    # Statistiques temporelles
+    col_stats1, col_stats2, col_stats3 = st.columns(3)
+    with col_stats1:
+        st.metric("CA moyen/période", formater_euro(stats_temp['ca_moyen_periode']))
+    with col_stats2:
+        st.metric("Commandes moy/période", formater_nombre(stats_temp['commandes_moyen_periode']))
+    with col_stats3:
+        st.metric("Meilleure période", stats_temp['meilleure_periode'])
+
+    st.divider()
 
-        # Ajouter ligne 80%
-        fig_pareto.add_hline(y=80, line_dash="dash", line_color="green", annotation_text="80%", secondary_y=True)
-        fig_pareto.update_layout(
-            title="Courbe de Pareto",
+    # Statistiques
+    col_t2, col_t4 = st.columns(2)
+    with col_t2:
+        st.metric("Croissance moy.", f"{stats_temp['croissance_moyenne']:.1f}%")
+    with col_t4:
+        st.metric("Pire mois", stats_temp['pire_mois'])
+
+    afficher_storytelling(INFO_CARD_STATS_PERIODE)
+
+
+# --- SOUS-ONGLET 3 : VARIATIONS ANNUELLES ---
+@st.fragment
+def afficher_variations_annuelles():
+    """📉 Sous-onglet Variations annuelles"""
+    st.markdown("#### 📉 Comparaison N/N-1 (Year-over-Year)")
+
+    temporal_avance = appeler_api("/kpi/temporel/avance")
+    df_comp = pd.DataFrame(temporal_avance['data'])
+
+    # Filtrer les données avec N-1 disponible
+    df_comp_valid = df_comp[df_comp['ca_n1'].notna()].copy()
+
+    if len(df_comp_valid) > 0:
+        # Variation YoY simplifiée
+        fig_yoy = px.bar(
+            df_comp_valid,
+            x='periode',
+            y='variation_yoy',
+            color='variation_yoy',
+            color_continuous_scale=['#dc3545', '#ffc107', '#28a745'],
+            color_continuous_midpoint=0,
+            title="Variation Year-over-Year (%)",
+            labels={'variation_yoy': 'Variation YoY (%)'},
             height=500
         )
-        fig_pareto.update_xaxes(title_text="Rang (du plus important au moins important)")
-        fig_pareto.update_yaxes(title_text="CA (€)", secondary_y=False)
-        fig_pareto.update_yaxes(title_text="% CA Cumulé", secondary_y=True, range=[0, 105])
-        st.plotly_chart(fig_pareto, use_container_width=True)
+        fig_yoy.update_layout(uirevision='constant')
 
-        # Tableau détaillé avec filtrage par classe
-        with st.expander("📋 Tableau détaillé des variations"):
-            st.markdown("#### 📋 Tableau Détaillé")
+        st.plotly_chart(fig_yoy, use_container_width=True, key='fig_yoy')
 
-            classe_filter = st.selectbox(
-                "Filtrer par classe",
-                options=['Toutes'] + list(df_abc_full['classe'].unique()),
-                key="abc_filter"
-            )
+        # Tableau détaillé des variations (construit uniquement à la demande)
+        with st.expander("📋 Tableau détaillé des variations"):
+            st.checkbox("Afficher", key="show_var_table")
+            if st.session_state.get("show_var_table"):
+                st.dataframe(
+                    df_comp_valid,
+                    column_order=['periode', 'ca', 'ca_n1', 'variation_yoy'],
+                    column_config={
+                        'periode': st.column_config.TextColumn('Période'),
+                        'ca': st.column_config.NumberColumn('CA Année N (€)', format='%.2f'),
+                        'ca_n1': st.column_config.NumberColumn('CA Année N-1 (€)', format='%.2f'),
+                        'variation_yoy': st.column_config.NumberColumn('Variation (%)', format='%.2f')
+                    },
+                    use_container_width=True,
+                    hide_index=True
+                )
+    else:
+        st.warning("⚠️ Pas assez de données pour la comparaison N/N-1")
 
-            if classe_filter == 'Toutes':
-                df_abc_filtered = df_abc_full.head(100)  # Limiter à 100 pour performance
-            else:
-                df_abc_filtered = df_abc_full[df_abc_full['classe'] == classe_filter].head(100)
+    afficher_storytelling(INFO_CARD_YOY)
 
-            st.dataframe(
-                df_abc_filtered[['nom', 'categorie', 'ca', 'profit', 'pct_ca', 'pct_cumul', 'classe']].rename(columns={
-                    'nom': 'Nom',
-                    'categorie': 'Catégorie',
-                    'ca': 'CA (€)',
-                    'profit': 'Profit (€)',
-                    'pct_ca': '% CA',
-                    'pct_cumul': '% Cumulé',
-                    'classe': 'Classe'
-                }),
-                use_container_width=True,
-                hide_index=True
-            ) 
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                La courbe de Pareto visualise la concentration extrême du CA : les 50 premiers produits (sur 1 850) génèrent déjà 30% du CA total, formant le coude critique de la courbe. Le premier produit seul pèse environ 60 000€, et les 10 premiers cumulent près de 10% du CA. Cette visualisation confirme qu'un tout petit nombre de références pilote la performance : concentrer les efforts commerciaux, la gestion des stocks et les négociations fournisseurs sur ces 50 produits critiques pourrait maximiser l'efficacité opérationnelle, tandis que les 1 800 autres références mériteraient une gestion plus automatisée et simplifiée.
-                </div>
-            """,
-            unsafe_allow_html=True
-        )
 
-# =============================================
-# TAB 3 : ÉVOLUTION TEMPORELLE
-# =============================================
-with tab3:
+def afficher_temporel():
+    """📅 Onglet Évolution temporelle"""
     st.markdown("### 📅 Évolution Temporelle")
     st.markdown("*Analyses temporelles consolidées : tendances, moyennes mobiles et comparaisons*")
     st.divider()
@@ -880,700 +1793,632 @@ with tab3:
 
     # --- SOUS-ONGLET 1 : ÉVOLUTION CA ET PROFIT ---
     with temp_tab1:
-        st.markdown("#### 📊 Évolution du CA, Profit et Commandes")
-
-        granularite = st.radio(
-            "Période d'analyse",
-            options=['jour', 'mois', 'annee'],
-            format_func=lambda x: {'jour': '📅 Par jour', 'mois': '📊 Par mois', 'annee': '📈 Par année'}[x],
-            horizontal=True
-        )
-
-        temporal = appeler_api("/kpi/temporel", params={'periode': granularite})
-        df_temporal = pd.DataFrame(temporal)
-
-        # Graphique d'évolution
-        fig_temporal = make_subplots(
-            rows=2, cols=1,
-            subplot_titles=("Évolution du CA et Profit", "Évolution du Nombre de Commandes"),
-            vertical_spacing=0.12,
-            specs=[[{"secondary_y": False}], [{"secondary_y": False}]]
-        )
-
-        # Graphique CA et Profit
-        fig_temporal.add_trace(
-            go.Scatter(
-                x=df_temporal['periode'],
-                y=df_temporal['ca'],
-                mode='lines+markers',
-                name='CA',
-                line=dict(color='#667eea', width=3),
-                fill='tozeroy'
-            ),
-            row=1, col=1
-        )
-
-        fig_temporal.add_trace(
-            go.Scatter(
-                x=df_temporal['periode'],
-                y=df_temporal['profit'],
-                mode='lines+markers',
-                name='Profit',
-                line=dict(color='#764ba2', width=3)
-            ),
-            row=1, col=1
-        )
-
-        # Graphique nombre de commandes
-        fig_temporal.add_trace(
-            go.Bar(
-                x=df_temporal['periode'],
-                y=df_temporal['nb_commandes'],
-                name='Commandes',
-                marker_color='#f39c12'
-            ),
-            row=2, col=1
-        )
-
-        fig_temporal.update_xaxes(title_text="Période", row=2, col=1)
-        fig_temporal.update_yaxes(title_text="Montant (€)", row=1, col=1)
-        fig_temporal.update_yaxes(title_text="Nombre", row=2, col=1)
-        fig_temporal.update_layout(height=700, showlegend=True)
-
-        st.plotly_chart(fig_temporal, use_container_width=True)
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                <b>1. Évolution Temporelle par jour</b><br>
-                La vue quotidienne montre une forte volatilité avec des pics jusqu’à 30 000€ certains jours et de
-                longues périodes quasi-nulles. Les gros CA ponctuels proviennent probablement de grosses commandes B2B, 
-                posant un défi de trésorerie et de planification. <br><br>
-                <b>2. Évolution Temporelle par mois</b><br>
-                L’agrégation mensuelle lisse la volatilité et révèle une tendance haussière de 2015 à 2018 : le CA moyen 
-                passe de 40 000€ à plus de 100 000€. Les commandes suivent une progression régulière, confirmant 
-                une croissance soutenue sur 4 ans, avec accélération notable depuis mi-2017. <br><br>
-                <b>3. Évolution Temporelle par année</b><br>
-                La vue annuelle confirme une croissance solide : le CA progresse de 470 000€ à 700 000€ 
-                entre 2015 et 2018, et les commandes de 1 000 à 1 600+. L’ascension constante démontre la solidité du modèle
-                et l’efficacité opérationnelle, avec 2018 comme année record. La question stratégique : comment dépasser le 
-                million d’euros ?
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        afficher_evolution_ca()
 
     # --- SOUS-ONGLET 2 : INDICATEURS CLÉS PAR PÉRIODE ---
     with temp_tab2:
-        st.markdown("#### 📊 Statistiques et Tendances par Période")
-
-        # Utiliser les données déjà chargées
-        temporal = appeler_api("/kpi/temporel", params={'periode': 'mois'})
-        df_temporal = pd.DataFrame(temporal)
-
-        # Statistiques temporelles
-        col_stats1, col_stats2, col_stats3 = st.columns(3)
-        with col_stats1:
-            st.metric("CA moyen/période", formater_euro(df_temporal['ca'].mean()))
-        with col_stats2:
-            st.metric("Commandes moy/période", formater_nombre(int(df_temporal['nb_commandes'].mean())))
-        with col_stats3:
-            meilleure_periode = df_temporal.loc[df_temporal['ca'].idxmax()]
-            st.metric("Meilleure période", meilleure_periode['periode'])
-
-        st.divider()
-
-        temporal_avance = appeler_api("/kpi/temporel/avance")
-        df_temp = pd.DataFrame(temporal_avance['data'])
-
-        # Statistiques
-        stats_temp = temporal_avance['statistiques']
-        col_t2, col_t4 = st.columns(2)
-        with col_t2:
-            st.metric("Croissance moy.", f"{stats_temp['croissance_moyenne']:.1f}%")
-        with col_t4:
-            st.metric("Pire mois", stats_temp['pire_mois'])
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                Le CA moyen mensuel atteint 47 858€ avec 104 commandes moyennes par mois, le pic historique 
-                restant novembre 2018. La croissance moyenne de 40,7% démontre une dynamique exceptionnelle, bien que le pire mois (février 
-                2015) contraste fortement avec cette tendance. 
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        afficher_indicateurs_periode()
 
     # --- SOUS-ONGLET 3 : VARIATIONS ANNUELLES ---
     with temp_tab3:
-        st.markdown("#### 📉 Comparaison N/N-1 (Year-over-Year)")
-
-        temporal_avance = appeler_api("/kpi/temporel/avance")
-        df_comp = pd.DataFrame(temporal_avance['data'])
-
-        # Filtrer les données avec N-1 disponible
-        df_comp_valid = df_comp[df_comp['ca_n1'].notna()].copy()
-
-        if len(df_comp_valid) > 0:
-            # Variation YoY simplifiée
-            fig_yoy = px.bar(
-                df_comp_valid,
-                x='periode',
-                y='variation_yoy',
-                color='variation_yoy',
-                color_continuous_scale=['#dc3545', '#ffc107', '#28a745'],
-                color_continuous_midpoint=0,
-                title="Variation Year-over-Year (%)",
-                labels={'variation_yoy': 'Variation YoY (%)'},
-                height=500
-            )
+        afficher_variations_annuelles()
 
-            st.plotly_chart(fig_yoy, use_container_width=True)
-
-            # Tableau détaillé des variations
-            with st.expander("📋 Tableau détaillé des variations"):
-                st.dataframe(
-                    df_comp_valid[['periode', 'ca', 'ca_n1', 'variation_yoy']].rename(columns={
-                        'periode': 'Période',
-                        'ca': 'CA Année N (€)',
-                        'ca_n1': 'CA Année N-1 (€)',
-                        'variation_yoy': 'Variation (%)'
-                    }),
-                    use_container_width=True,
-                    hide_index=True
-                )
-        else:
-            st.warning("⚠️ Pas assez de données pour la comparaison N/N-1")
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                L'analyse Year-over-Year montre une croissance volatile mais majoritairement positive : janvier 2016 
-                explose à +160% (effet de base faible), suivie de fluctuations entre -40% et +140%. À partir de 2017, la 
-                croissance se stabilise entre +10% et +90%, avec une tendance haussière marquée. Fin 2018 ralentit légèrement (+20-
-                50%), ce qui est normal après une forte croissance. Cette volatilité en dents de scie suggère des effets 
-                saisonniers ou des variations ponctuelles de commandes importantes, mais la tendance générale reste 
-                solidement positive sur 3 ans.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
 
 # =============================================
 # TAB 4 : GÉOGRAPHIE
 # =============================================
-with tab4:
+# --- PERFORMANCE PAR ÉTAT ---
+@st.fragment
+def afficher_etats():
+    """🗺️ Sous-onglet Performance États"""
+    st.markdown("**Performance par État (Heatmap)**")
+
+    etats_data = appeler_api("/kpi/geographique/etats")
+    df_etats = pd.DataFrame(etats_data['data'])
+    df_etats['region'] = df_etats['region'].astype('category')
+
+    # Heatmap des états par marge
+    # Hiérarchie région → état construite directement (évite l'inférence de px.treemap)
+    df_regions = df_etats.groupby('region', sort=False, observed=True).agg(
+        ca=('ca', 'sum'), profit=('profit', 'sum'), nb_clients=('nb_clients', 'sum')
+    ).reset_index()
+    df_regions['marge_pct'] = df_regions['profit'] / df_regions['ca'] * 100
+    df_regions['ca_par_client'] = df_regions['ca'] / df_regions['nb_clients']
+
+    fig_heatmap_etats = go.Figure(go.Treemap(
+        ids=list(df_etats['region'].astype(str) + '/' + df_etats['etat']) + list(df_regions['region']),
+        labels=list(df_etats['etat']) + list(df_regions['region']),
+        parents=list(df_etats['region']) + [''] * len(df_regions),
+        values=list(df_etats['ca']) + list(df_regions['ca']),
+        branchvalues='total',
+        customdata=np.vstack([
+            df_etats[['profit', 'nb_clients', 'ca_par_client']].to_numpy(),
+            df_regions[['profit', 'nb_clients', 'ca_par_client']].to_numpy()
+        ]),
+        marker=dict(
+            colors=list(df_etats['marge_pct']) + list(df_regions['marge_pct']),
+            colorscale='RdYlGn',
+            cmid=etats_data['seuils']['marge_median'],
+            colorbar=dict(title='marge_pct'),
+            showscale=True
+        ),
+        hovertemplate="<b>%{label}</b><br>CA: %{value:,.2f}<br>Profit: %{customdata[0]:,.2f}"
+                      "<br>Clients: %{customdata[1]}<br>CA/Client: %{customdata[2]:,.2f}"
+                      "<br>Marge: %{color:.2f}%<extra></extra>"
+    ))
+    fig_heatmap_etats.update_layout(title="Treemap : CA (taille) et Marge (couleur) par État", height=600)
+
+    fig_heatmap_etats.update_layout(uirevision='constant')
+    st.plotly_chart(fig_heatmap_etats, use_container_width=True, key='fig_heatmap_etats')
+
+    # Tableau complet
+    with st.expander("📋 Tableau complet par État"):
+        st.dataframe(
+            df_etats,
+            column_order=['etat', 'region', 'ca', 'profit', 'marge_pct', 'nb_clients', 'ca_par_client', 'performance'],
+            column_config={
+                'etat': st.column_config.TextColumn('État'),
+                'region': st.column_config.TextColumn('Région'),
+                'ca': st.column_config.NumberColumn('CA (€)', format='%.2f'),
+                'profit': st.column_config.NumberColumn('Profit (€)', format='%.2f'),
+                'marge_pct': st.column_config.NumberColumn('Marge (%)', format='%.2f'),
+                'nb_clients': st.column_config.NumberColumn('Clients', format='%d'),
+                'ca_par_client': st.column_config.NumberColumn('CA/Client (€)', format='%.2f'),
+                'performance': st.column_config.TextColumn('Performance')
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+
+    afficher_storytelling(INFO_CARD_ETATS)
+
+
+# --- TOP VILLES ---
+@st.fragment
+def afficher_top_villes():
+    """🏙️ Sous-onglet Top villes"""
+    st.markdown("**Top Villes Performantes**")
+
+    nb_villes = st.slider("Nombre de villes", 10, 50, 20, key="nb_villes")
+    villes_data = appeler_api(
+        "/kpi/geographique/villes",
+        params={'limite': nb_villes, 'fields': 'ca,ville,region'}
+    )
+
+    # Stats
+    stats_villes = villes_data['statistiques']
+    col_v1, col_v2, col_v3 = st.columns(3)
+    with col_v1:
+        st.metric("Nb villes total", stats_villes['nb_villes_total'])
+    with col_v2:
+        st.metric("CA moyen/ville", formater_euro(stats_villes['ca_moyen_ville']))
+    with col_v3:
+        st.metric("Clients moy/ville", f"{stats_villes['clients_moyen_ville']:.1f}")
+
+    # Top CA
+    df_villes_ca = pd.DataFrame(villes_data['top_ca'])
+    df_villes_ca['region'] = df_villes_ca['region'].astype('category')
+
+    fig_villes = px.bar(
+        df_villes_ca.head(15),
+        x='ca',
+        y='ville',
+        color='region',
+        orientation='h',
+        title=f"Top 15 Villes par CA",
+        labels={'ca': 'CA (€)', 'ville': 'Ville'},
+        height=500
+    )
+    fig_villes.update_layout(yaxis={'categoryorder': 'total ascending'})
+    fig_villes.update_layout(uirevision='constant')
+    st.plotly_chart(fig_villes, use_container_width=True, key='fig_villes')
+
+    afficher_storytelling(INFO_CARD_VILLES)
+
+
+# --- VUE RÉGIONS STANDARD ---
+@st.fragment
+def afficher_vue_regions():
+    """📊 Sous-onglet Vue régions"""
+    df_geo = charger_df("/kpi/geographique")
+
+    col_geo1, col_geo2 = st.columns(2)
+
+    with col_geo1:
+        fig_geo_ca = px.bar(
+            df_geo, x='region', y='ca',
+            title="CA par Région",
+            color='ca', color_continuous_scale='Blues',
+            text='ca', height=400
+        )
+        fig_geo_ca.update_traces(texttemplate='%{text:,.0f}€', textposition='outside')
+        fig_geo_ca.update_layout(uirevision='constant')
+        st.plotly_chart(fig_geo_ca, use_container_width=True, key='fig_geo_ca')
+
+    with col_geo2:
+        fig_geo_clients = px.pie(
+            df_geo, values='nb_clients', names='region',
+            title="Répartition Clients par Région",
+            color_discrete_sequence=_SET3,
+            height=400
+        )
+        fig_geo_clients.update_traces(textposition='inside', textinfo='percent+label')
+        fig_geo_clients.update_layout(uirevision='constant')
+        st.plotly_chart(fig_geo_clients, use_container_width=True, key='fig_geo_clients')
+
+    afficher_storytelling(INFO_CARD_REGIONS)
+
+
+def afficher_geographie():
+    """🌍 Onglet Géographie"""
     st.markdown("### 🌍 Analyse Géographique")
     st.markdown("*Analyses spatiales : performance par région, état et ville*")
     st.divider()
 
+    # Les trois vues sont indépendantes : leurs appels API partent en parallèle
+    # et chaque sous-onglet lit ensuite sa réponse dans le cache
+    prechargements_geo = precharger_api({
+        'etats': ("/kpi/geographique/etats", ()),
+        'villes': ("/kpi/geographique/villes", (('fields', 'ca,ville,region'), ('limite', st.session_state.get("nb_villes", 20)))),
+        'regions': ("/kpi/geographique", ())
+    })
+    attendre_prechargements(prechargements_geo)
+
     geo_tab1, geo_tab2, geo_tab3 = st.tabs(["🗺️ Performance États", "🏙️ Top Villes", "📊 Vue Régions"])
 
     # --- PERFORMANCE PAR ÉTAT ---
     with geo_tab1:
-        st.markdown("**Performance par État (Heatmap)**")
-
-        etats_data = appeler_api("/kpi/geographique/etats")
-        df_etats = pd.DataFrame(etats_data['data'])
-
-        # Heatmap des états par marge
-        fig_heatmap_etats = px.treemap(
-            df_etats,
-            path=['region', 'etat'],
-            values='ca',
-            color='marge_pct',
-            color_continuous_scale='RdYlGn',
-            color_continuous_midpoint=df_etats['marge_pct'].median(),
-            title="Treemap : CA (taille) et Marge (couleur) par État",
-            hover_data=['profit', 'nb_clients', 'ca_par_client'],
-            height=600
-        )
-
-        st.plotly_chart(fig_heatmap_etats, use_container_width=True)
-
-        # Tableau complet
-        with st.expander("📋 Tableau complet par État"):
-            st.dataframe(
-                df_etats[['etat', 'region', 'ca', 'profit', 'marge_pct', 'nb_clients', 'ca_par_client', 'performance']].rename(columns={
-                    'etat': 'État',
-                    'region': 'Région',
-                    'ca': 'CA (€)',
-                    'profit': 'Profit (€)',
-                    'marge_pct': 'Marge (%)',
-                    'nb_clients': 'Clients',
-                    'ca_par_client': 'CA/Client (€)',
-                    'performance': 'Performance'
-                }),
-                use_container_width=True,
-                hide_index=True
-            )
-        
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                La heatmap révèle une performance par État très contrastée : la Californie (West) domine en taille mais pas en marge, 
-                tout comme Pennsylvania, Texas, Ohio et Illinois (en rouge/orange) qui affichent des marges négatives ou très 
-                faibles malgré des volumes importants. New York, bien que générant du CA, souffre également de rentabilité. A l'inverse, des états peu volumineux ont des marges plutôt élevées.
-                Cette cartographie met en évidence un paradoxe : les plus gros États ne sont pas les plus rentables. 
-                L'entreprise doit investiguer les causes (prix trop bas, coûts logistiques, mix produit défavorable) et 
-                corriger rapidement la situation dans ces États stratégiques pour transformer du volume en profit.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        afficher_etats()
 
     # --- TOP VILLES ---
     with geo_tab2:
-        st.markdown("**Top Villes Performantes**")
-
-        nb_villes = st.slider("Nombre de villes", 10, 50, 20)
-        villes_data = appeler_api("/kpi/geographique/villes", params={'limite': nb_villes})
-
-        # Stats
-        stats_villes = villes_data['statistiques']
-        col_v1, col_v2, col_v3 = st.columns(3)
-        with col_v1:
-            st.metric("Nb villes total", stats_villes['nb_villes_total'])
-        with col_v2:
-            st.metric("CA moyen/ville", formater_euro(stats_villes['ca_moyen_ville']))
-        with col_v3:
-            st.metric("Clients moy/ville", f"{stats_villes['clients_moyen_ville']:.1f}")
-
-        # Top CA
-        df_villes_ca = pd.DataFrame(villes_data['top_ca'])
-
-        fig_villes = px.bar(
-            df_villes_ca.head(15),
-            x='ca',
-            y='ville',
-            color='region',
-            orientation='h',
-            title=f"Top 15 Villes par CA",
-            labels={'ca': 'CA (€)', 'ville': 'Ville'},
-            height=500
-        )
-        fig_villes.update_layout(yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_villes, use_container_width=True)
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                604 villes génèrent un CA moyen de 3 803€ par ville, New York City dominant largement avec plus 
-                de 250 000€, soit presque le double de Los Angeles (200 000€). Les régions East et West concentrent les plus grosses villes 
-                performantes, tandis que Central (Houston, Chicago, Detroit) et South (Jacksonville, San Antonio) ont des 
-                contributions plus modestes. Cette concentration géographique sur quelques métropoles majeures révèle un 
-                potentiel inexploité dans les villes moyennes : développer la présence commerciale dans les 580+ villes 
-                à faible CA pourrait doubler le chiffre d'affaires national.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        afficher_top_villes()
 
     # --- VUE RÉGIONS STANDARD ---
     with geo_tab3:
-        geo = appeler_api("/kpi/geographique")
-        df_geo = pd.DataFrame(geo)
-
-        col_geo1, col_geo2 = st.columns(2)
+        afficher_vue_regions()
 
-        with col_geo1:
-            fig_geo_ca = px.bar(
-                df_geo, x='region', y='ca',
-                title="CA par Région",
-                color='ca', color_continuous_scale='Blues',
-                text='ca', height=400
-            )
-            fig_geo_ca.update_traces(texttemplate='%{text:,.0f}€', textposition='outside')
-            st.plotly_chart(fig_geo_ca, use_container_width=True)
-
-        with col_geo2:
-            fig_geo_clients = px.pie(
-                df_geo, values='nb_clients', names='region',
-                title="Répartition Clients par Région",
-                color_discrete_sequence=px.colors.qualitative.Set3,
-                height=400
-            )
-            fig_geo_clients.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig_geo_clients, use_container_width=True)
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Analyse Géographique – Synthèse</div>
-                Les régions West et East dominent le chiffre d’affaires (725 000€ et 679 000€), 
-                représentant 55% de l’activité. La répartition des clients reste équilibrée (27,4% West, 26,9% East), 
-                mais le profit par région montre une surperformance de West (108 000€ vs 91 000€).
-                Les régions Central et South, avec une densité de clients similaire mais un CA inférieur, 
-                représentent un potentiel de croissance important si les actions commerciales sont adaptées.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
 
 # =============================================
 # TAB 5 : CLIENTS
 # =============================================
-with tab5:
-    st.markdown("### 👥 Analyse Clients")
-    st.markdown("*Comportement client, fidélisation, segmentation et valeur vie client*")
-    st.divider()
-
-    client_tab1, client_tab2, client_tab3, client_tab4, client_tab5 = st.tabs([
-        "📊 Vue Générale",
-        "🎯 Segmentation RFM",
-        "💰 Customer Lifetime Value",
-        "🔄 Délai de Réachat",
-        "📈 Taux de Rétention"
-    ])
-
-    # --- VUE GÉNÉRALE ---
-    with client_tab1:
-        st.markdown("#### 📊 Vue Générale des Clients")
-
-        clients_data = appeler_api("/kpi/clients", params={'limite': 10})
-
-        col_client1, col_client2 = st.columns([2, 1])
-
-        with col_client1:
-            df_top_clients = pd.DataFrame(clients_data['top_clients'])
-            fig_clients = px.bar(
-                df_top_clients, x='ca_total', y='nom', orientation='h',
-                title="Top 10 Clients par CA",
-                color='nb_commandes', color_continuous_scale='Viridis',
-                height=400
-            )
-            st.plotly_chart(fig_clients, use_container_width=True)
-
-        with col_client2:
-            rec = clients_data['recurrence']
-            st.metric("Total clients", formater_nombre(rec['total_clients']))
-            st.metric("Clients récurrents", formater_nombre(rec['clients_recurrents']))
-            st.metric("Clients 1 achat", formater_nombre(rec['clients_1_achat']))
-            taux_fid = (rec['clients_recurrents'] / rec['total_clients'] * 100) if rec['total_clients'] > 0 else 0
-            st.metric("Taux fidélisation", f"{taux_fid:.1f}%")
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                Avec 98,5 % de clients récurrents, l’entreprise affiche une fidélisation exceptionnelle et 
-                des relations commerciales régulières (6,3 commandes par client).
-                Le faible nombre de nouveaux clients suggère une phase de maturité ou un ralentissement de 
-                l’acquisition.
-                Enfin, la répartition homogène du chiffre d’affaires du top 10 clients indique une 
-                base clients équilibrée, sans dépendance excessive à un compte unique.
-                </div>
-            """,
-            unsafe_allow_html=True
+# --- VUE GÉNÉRALE ---
+def afficher_vue_clients():
+    """📊 Sous-onglet Vue générale"""
+    st.markdown("#### 📊 Vue Générale des Clients")
+
+    col_client1, col_client2 = st.columns([2, 1])
+
+    with col_client1:
+        df_top_clients = charger_df("/kpi/clients/top", params={'limite': 10})
+        fig_clients = px.bar(
+            df_top_clients, x='ca_total', y='nom', orientation='h',
+            title="Top 10 Clients par CA",
+            color='nb_commandes', color_continuous_scale='Viridis',
+            height=400
         )
+        fig_clients.update_layout(uirevision='constant')
+        st.plotly_chart(fig_clients, use_container_width=True, key='fig_clients')
+
+    with col_client2:
+        rec = appeler_api("/kpi/clients/recurrence")
+        st.metric("Total clients", formater_nombre(rec['total_clients']))
+        st.metric("Clients récurrents", formater_nombre(rec['clients_recurrents']))
+        st.metric("Clients 1 achat", formater_nombre(rec['clients_1_achat']))
+        st.metric("Taux fidélisation", f"{rec['taux_fidelisation']:.1f}%")
+
+    # Segments
+    df_segments = charger_df("/kpi/clients/segments")
+    df_segments['segment'] = df_segments['segment'].astype('category')
+    fig_segments = go.Figure()
+    fig_segments.add_trace(go.Bar(name='CA', x=df_segments['segment'], y=df_segments['ca'], marker_color='#3498db'))
+    fig_segments.add_trace(go.Bar(name='Profit', x=df_segments['segment'], y=df_segments['profit'], marker_color='#2ecc71'))
+    fig_segments.update_layout(title="CA et Profit par Segment", barmode='group', height=350)
+    fig_segments.update_layout(uirevision='constant')
+    st.plotly_chart(fig_segments, use_container_width=True, key='fig_segments')
+
+    # Les deux cartes du sous-onglet partent dans un seul élément
+    afficher_storytelling(INFO_CARD_CLIENTS, INFO_CARD_SEGMENTS)
+
+
+# --- SEGMENTATION RFM ---
+def afficher_rfm():
+    """🎯 Sous-onglet Segmentation RFM"""
+    st.markdown("#### 🎯 Segmentation RFM")
+    st.markdown("""
+    **Segmentation basée sur :**
+    - **R** (Recency) : Ancienneté du dernier achat
+    - **F** (Frequency) : Fréquence d'achat
+    - **M** (Monetary) : Montant total dépensé
+    """)
+
+    rfm_data = appeler_api("/kpi/clients/rfm")
+
+    # Statistiques globales
+    stats_rfm = rfm_data['statistiques']
+    col_rfm1, col_rfm2, col_rfm3, col_rfm4 = st.columns(4)
+    with col_rfm1:
+        st.metric("👥 Total Clients", formater_nombre(stats_rfm['nb_total_clients']))
+    with col_rfm2:
+        st.metric("📅 Récence Moy.", f"{stats_rfm['recency_moyenne']:.0f} jours")
+    with col_rfm3:
+        st.metric("🔄 Fréquence Moy.", f"{stats_rfm['frequency_moyenne']:.1f}")
+    with col_rfm4:
+        st.metric("💰 Montant Moy.", formater_euro(stats_rfm['monetary_moyenne']))
 
-        # Segments
-        df_segments = pd.DataFrame(clients_data['segments'])
-        fig_segments = go.Figure()
-        fig_segments.add_trace(go.Bar(name='CA', x=df_segments['segment'], y=df_segments['ca'], marker_color='#3498db'))
-        fig_segments.add_trace(go.Bar(name='Profit', x=df_segments['segment'], y=df_segments['profit'], marker_color='#2ecc71'))
-        fig_segments.update_layout(title="CA et Profit par Segment", barmode='group', height=350)
-        st.plotly_chart(fig_segments, use_container_width=True)
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                Le segment Consumer domine largement le chiffre d’affaires (> 1,2 M€), loin devant les 
-                segments Corporate et Home Office.
-                Cependant, les écarts de marge suggèrent que ces segments plus modestes pourraient offrir 
-                une rentabilité ou une stabilité supérieure.
-                Cette structure pose un enjeu stratégique clair : poursuivre la spécialisation Consumer ou 
-                diversifier vers des segments à plus forte valeur ajoutée.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+    st.divider()
 
-    # --- SEGMENTATION RFM ---
-    with client_tab2:
-        st.markdown("#### 🎯 Segmentation RFM")
-        st.markdown("""
-        **Segmentation basée sur :**
-        - **R** (Recency) : Ancienneté du dernier achat
-        - **F** (Frequency) : Fréquence d'achat
-        - **M** (Monetary) : Montant total dépensé
-        """)
+    # Répartition par segment (figures construites une seule fois pour une même réponse API)
+    fig_rfm_pie, fig_rfm_bar = construire_figs_rfm(rfm_data)
 
-        rfm_data = appeler_api("/kpi/clients/rfm")
+    col_left_rfm, col_right_rfm = st.columns([1, 1])
 
-        # Statistiques globales
-        stats_rfm = rfm_data['statistiques']
-        col_rfm1, col_rfm2, col_rfm3, col_rfm4 = st.columns(4)
-        with col_rfm1:
-            st.metric("👥 Total Clients", formater_nombre(stats_rfm['nb_total_clients']))
-        with col_rfm2:
-            st.metric("📅 Récence Moy.", f"{stats_rfm['recency_moyenne']:.0f} jours")
-        with col_rfm3:
-            st.metric("🔄 Fréquence Moy.", f"{stats_rfm['frequency_moyenne']:.1f}")
-        with col_rfm4:
-            st.metric("💰 Montant Moy.", formater_euro(stats_rfm['monetary_moyenne']))
+    with col_left_rfm:
+        st.plotly_chart(fig_rfm_pie, use_container_width=True, key='fig_rfm_pie')
 
-        st.divider()
+    with col_right_rfm:
+        st.plotly_chart(fig_rfm_bar, use_container_width=True, key='fig_rfm_bar')
 
-        # Répartition par segment
-        df_segments_rfm = pd.DataFrame(rfm_data['segments'])
+    afficher_storytelling(INFO_CARD_RFM)
 
-        col_left_rfm, col_right_rfm = st.columns([1, 1])
 
-        with col_left_rfm:
-            fig_rfm_pie = px.pie(
-                df_segments_rfm,
-                values='nb_clients',
-                names='segment',
-                title="Répartition des Clients par Segment RFM",
-                height=400,
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-            fig_rfm_pie.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig_rfm_pie, use_container_width=True)
-
-        with col_right_rfm:
-            fig_rfm_bar = px.bar(
-                df_segments_rfm.sort_values('ca_total', ascending=True),
-                y='segment',
-                x='ca_total',
-                orientation='h',
-                title="CA Total par Segment RFM",
-                labels={'ca_total': 'CA Total (€)', 'segment': 'Segment'},
-                color='ca_total',
-                color_continuous_scale='Greens',
-                height=400
-            )
-            st.plotly_chart(fig_rfm_bar, use_container_width=True)
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                La segmentation RFM (Récence, Fréquence, Montant) classe les 793 clients selon leur comportement d'achat, révélant une récence moyenne de 147 jours et une fréquence de 6,3 achats pour un montant moyen de 2 897€. Les segments "Fidèles" et "Champions" dominent le CA avec plus de 600 000€ chacun, représentant les clients les plus actifs et généreux. Les "À risque" (18,3% des clients) et "Perdus" (21,6%) nécessitent des actions de reconquête urgentes, tandis que les "Nouveaux" (11,2%) doivent être rapidement convertis en clients réguliers. Cette segmentation actionnable permet de prioriser les efforts marketing : récompenser les Champions, réactiver les clients À risque, et accompagner les Nouveaux vers la fidélisation.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+# --- CUSTOMER LIFETIME VALUE ---
+def afficher_clv():
+    """💰 Sous-onglet Customer Lifetime Value"""
+    st.markdown("#### 💰 Customer Lifetime Value (CLV)")
+    st.markdown("*Valeur vie client projetée sur 3 ans*")
 
-    # --- CUSTOMER LIFETIME VALUE ---
-    with client_tab3:
-        st.markdown("#### 💰 Customer Lifetime Value (CLV)")
-        st.markdown("*Valeur vie client projetée sur 3 ans*")
+    nb_clients_clv = st.slider("Nombre de clients", 10, 100, 50, key="clv_slider")
 
-        nb_clients_clv = st.slider("Nombre de clients", 10, 100, 50, key="clv_slider")
+    # Seules les colonnes affichées sont demandées à l'API
+    params_clv = {'limite': nb_clients_clv, 'fields': _CHAMPS_CLV}
+    clv_data = appeler_api("/kpi/clients/clv", params=params_clv)
 
-        clv_data = appeler_api("/kpi/clients/clv", params={'limite': nb_clients_clv})
+    # Statistiques
+    stats_clv = clv_data['statistiques']
+    col_clv1, col_clv2, col_clv3 = st.columns(3)
+    with col_clv1:
+        st.metric("💎 CLV Moyenne", formater_euro(stats_clv['clv_moyenne']))
+    with col_clv2:
+        st.metric("📊 CLV Médiane", formater_euro(stats_clv['clv_mediane']))
+    with col_clv3:
+        st.metric("📈 CA Annuel Moy.", formater_euro(stats_clv['ca_annuel_moyen']))
 
-        # Statistiques
-        stats_clv = clv_data['statistiques']
-        col_clv1, col_clv2, col_clv3 = st.columns(3)
-        with col_clv1:
-            st.metric("💎 CLV Moyenne", formater_euro(stats_clv['clv_moyenne']))
-        with col_clv2:
-            st.metric("📊 CLV Médiane", formater_euro(stats_clv['clv_mediane']))
-        with col_clv3:
-            st.metric("📈 CA Annuel Moy.", formater_euro(stats_clv['ca_annuel_moyen']))
+    st.divider()
 
-        st.divider()
+    # Répartition par catégorie
+    df_cat_clv = charger_df("/kpi/clients/clv", params=params_clv, cle='par_categorie')
 
-        # Répartition par catégorie
-        df_cat_clv = pd.DataFrame(clv_data['par_categorie'])
+    col_cat1, col_cat2 = st.columns(2)
 
-        col_cat1, col_cat2 = st.columns(2)
+    # Figures réutilisées tant que les données ne changent pas (slider, case à cocher)
+    fig_clv_cat, fig_clv_value = construire_figs_clv_categories(df_cat_clv)
 
-        with col_cat1:
-            fig_clv_cat = px.pie(
-                df_cat_clv,
-                values='nb_clients',
-                names='categorie',
-                title="Répartition des Clients par Catégorie CLV",
-                height=350
-            )
-            st.plotly_chart(fig_clv_cat, use_container_width=True)
-
-        with col_cat2:
-            fig_clv_value = px.bar(
-                df_cat_clv,
-                x='categorie',
-                y='clv_total',
-                title="CLV Totale par Catégorie",
-                labels={'clv_total': 'CLV Totale (€)', 'categorie': 'Catégorie'},
-                color='clv_total',
-                color_continuous_scale='Blues',
-                height=350
-            )
-            st.plotly_chart(fig_clv_value, use_container_width=True)
+    with col_cat1:
+        st.plotly_chart(fig_clv_cat, use_container_width=True, key='fig_clv_cat')
 
-        # Top clients par CLV
-        df_top_clv = pd.DataFrame(clv_data['top_clients'])
+    with col_cat2:
+        st.plotly_chart(fig_clv_value, use_container_width=True, key='fig_clv_value')
 
-        fig_clv_top = px.bar(
-            df_top_clv.head(20),
-            x='clv_3_ans',
-            y='client',
-            orientation='h',
-            title="Top 20 Clients par CLV (3 ans)",
-            labels={'clv_3_ans': 'CLV 3 ans (€)', 'client': 'Client'},
-            color='categorie',
-            height=600
-        )
-        fig_clv_top.update_layout(yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_clv_top, use_container_width=True)
+    # Top clients par CLV
+    df_top_clv = charger_df("/kpi/clients/clv", params=params_clv, cle='top_clients')
+    df_top_clv['categorie'] = df_top_clv['categorie'].astype('category')
 
-        # Tableau détaillé
-        with st.expander("📋 Tableau détaillé CLV"):
+    # Seules les colonnes tracées des 20 premiers clients sont envoyées à Plotly
+    fig_clv_top = construire_fig_clv_top(df_top_clv.head(20)[['client', 'clv_3_ans', 'categorie']])
+    st.plotly_chart(fig_clv_top, use_container_width=True, key='fig_clv_top')
+
+    # Tableau détaillé
+    with st.expander("📋 Tableau détaillé CLV"):
+        st.checkbox("Afficher", key="show_clv_table")
+        if st.session_state.get("show_clv_table"):
             st.dataframe(
-                df_top_clv[['client', 'ca_total', 'nb_commandes', 'ca_annuel', 'clv_3_ans', 'profit_clv_3_ans', 'categorie']].rename(columns={
-                    'client': 'Client',
-                    'ca_total': 'CA Total (€)',
-                    'nb_commandes': 'Nb Commandes',
-                    'ca_annuel': 'CA Annuel (€)',
-                    'clv_3_ans': 'CLV 3 ans (€)',
-                    'profit_clv_3_ans': 'Profit CLV 3 ans (€)',
-                    'categorie': 'Catégorie'
-                }),
+                df_top_clv,
+                column_order=['client', 'ca_total', 'nb_commandes', 'ca_annuel', 'clv_3_ans', 'profit_clv_3_ans', 'categorie'],
+                column_config={
+                    'client': st.column_config.TextColumn('Client'),
+                    'ca_total': st.column_config.NumberColumn('CA Total (€)', format='%.2f'),
+                    'nb_commandes': st.column_config.NumberColumn('Nb Commandes', format='%d'),
+                    'ca_annuel': st.column_config.NumberColumn('CA Annuel (€)', format='%.2f'),
+                    'clv_3_ans': st.column_config.NumberColumn('CLV 3 ans (€)', format='%.2f'),
+                    'profit_clv_3_ans': st.column_config.NumberColumn('Profit CLV 3 ans (€)', format='%.2f'),
+                    'categorie': st.column_config.TextColumn('Catégorie')
+                },
                 use_container_width=True,
                 hide_index=True
             )
 
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                La CLV moyenne de 11 434€ sur 3 ans (médiane à 2 603€) révèle une forte disparité de valeur client, avec 31,4% des clients "Élevés" représentant 7 millions d'euros cumulés. Cette concentration atteint son paroxysme dans le top 20, dominé par Jenna Caffey, Susan Mackendrick et Theresa Coyne, soit des actifs clients extraordinaires qui, à eux seuls, représentent plus de 15% de la valeur future totale. L'écart brutal avec le reste du top 20 (sous 200 000€) et les 23% de clients à "Faible" CLV crée un double enjeu stratégique : d'une part, la perte d'un seul top 5 client détruirait plusieurs centaines de milliers d'euros de valeur, nécessitant un account management dédié avec contrats pluriannuels et support premium ; d'autre part, l'allocation budgétaire doit impérativement être repensée pour surinvestir dans la rétention des clients à fort potentiel tout en automatisant le service des clients à faible CLV pour préserver la rentabilité globale.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+    afficher_storytelling(INFO_CARD_CLV)
 
-    # --- DÉLAI DE RÉACHAT ---
-    with client_tab4:
-        st.markdown("#### 🔄 Délai Moyen de Réachat")
-        st.markdown("*Temps moyen entre deux achats par client*")
 
-        delai_data = appeler_api("/kpi/clients/delai-rachat")
+# --- DÉLAI DE RÉACHAT ---
+def afficher_delai_rachat():
+    """🔄 Sous-onglet Délai de réachat"""
+    st.markdown("#### 🔄 Délai Moyen de Réachat")
+    st.markdown("*Temps moyen entre deux achats par client*")
 
-        # Statistiques globales
-        stats_delai = delai_data['statistiques']
-        col_del1, col_del2, col_del3 = st.columns(3)
-        with col_del1:
-            st.metric("📅 Délai Moyen", f"{stats_delai['delai_moyen_jours']:.0f} jours")
-        with col_del2:
-            st.metric("📊 Délai Médian", f"{stats_delai['delai_median_jours']:.0f} jours")
-        with col_del3:
-            st.metric("🔄 Nb Rachats", formater_nombre(stats_delai['nb_rachats_total']))
+    delai_data = appeler_api("/kpi/clients/delai-rachat")
 
-        st.divider()
+    # Statistiques globales
+    stats_delai = delai_data['statistiques']
+    col_del1, col_del2, col_del3 = st.columns(3)
+    with col_del1:
+        st.metric("📅 Délai Moyen", f"{stats_delai['delai_moyen_jours']:.0f} jours")
+    with col_del2:
+        st.metric("📊 Délai Médian", f"{stats_delai['delai_median_jours']:.0f} jours")
+    with col_del3:
+        st.metric("🔄 Nb Rachats", formater_nombre(stats_delai['nb_rachats_total']))
 
-        # Distribution des délais
-        distribution_delai = delai_data['distribution']
-
-        df_distrib = pd.DataFrame([
-            {'tranche': k, 'nb_rachats': v}
-            for k, v in distribution_delai.items()
-        ])
-
-        fig_distrib = px.bar(
-            df_distrib,
-            x='tranche',
-            y='nb_rachats',
-            title="Distribution des Délais de Réachat",
-            labels={'tranche': 'Tranche de délai', 'nb_rachats': 'Nombre de rachats'},
-            color='nb_rachats',
-            color_continuous_scale='Viridis',
-            height=400
-        )
-        st.plotly_chart(fig_distrib, use_container_width=True)
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                Le délai moyen de réachat de 189 jours (médiane 129 jours) sur 4 199 rachats révèle un cycle d'achat relativement long, cohérent avec un modèle B2B de fournitures et équipements. La distribution montre une concentration dans les tranches 90-180 jours (environ 2 000 rachats), suggérant un cycle naturel trimestriel ou semestriel. Cette donnée permet d'optimiser les relances commerciales : contacter proactivement les clients 15-30 jours avant leur date de réachat prévue pourrait améliorer la rétention et prévenir le churn.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+    st.divider()
 
-    # --- TAUX DE RÉTENTION ---
-    with client_tab5:
-        st.markdown("#### 📈 Taux de Rétention (Cohort Analysis)")
-        st.markdown("*Analyse de la rétention client par cohorte (mois de première commande)*")
-
-        retention_data = appeler_api("/kpi/clients/retention")
-
-        # Statistiques
-        stats_ret = retention_data['statistiques']
-        col_ret1, col_ret2, col_ret3, col_ret4 = st.columns(4)
-        with col_ret1:
-            st.metric("📊 Nb Cohortes", stats_ret['nb_cohortes'])
-        with col_ret2:
-            st.metric("📅 Rétention 1M", f"{stats_ret['retention_1_mois']:.1f}%")
-        with col_ret3:
-            st.metric("📅 Rétention 3M", f"{stats_ret['retention_3_mois']:.1f}%")
-        with col_ret4:
-            st.metric("📅 Rétention 6M", f"{stats_ret['retention_6_mois']:.1f}%")
+    # Distribution des délais
+    distribution_delai = delai_data['distribution']
+
+    df_distrib = pd.DataFrame({
+        'tranche': list(distribution_delai),
+        'nb_rachats': list(distribution_delai.values())
+    })
+
+    fig_distrib = px.bar(
+        df_distrib,
+        x='tranche',
+        y='nb_rachats',
+        title="Distribution des Délais de Réachat",
+        labels={'tranche': 'Tranche de délai', 'nb_rachats': 'Nombre de rachats'},
+        color='nb_rachats',
+        color_continuous_scale='Viridis',
+        height=400
+    )
+    fig_distrib.update_layout(uirevision='constant')
+    st.plotly_chart(fig_distrib, use_container_width=True, key='fig_distrib')
+
+    afficher_storytelling(INFO_CARD_DELAI_RACHAT)
+
+
+# --- TAUX DE RÉTENTION ---
+def afficher_retention():
+    """📈 Sous-onglet Taux de rétention"""
+    st.markdown("#### 📈 Taux de Rétention (Cohort Analysis)")
+    st.markdown("*Analyse de la rétention client par cohorte (mois de première commande)*")
+
+    retention_data = appeler_api("/kpi/clients/retention")
+
+    # Statistiques
+    stats_ret = retention_data['statistiques']
+    col_ret1, col_ret2, col_ret3, col_ret4 = st.columns(4)
+    with col_ret1:
+        st.metric("📊 Nb Cohortes", stats_ret['nb_cohortes'])
+    with col_ret2:
+        st.metric("📅 Rétention 1M", f"{stats_ret['retention_1_mois']:.1f}%")
+    with col_ret3:
+        st.metric("📅 Rétention 3M", f"{stats_ret['retention_3_mois']:.1f}%")
+    with col_ret4:
+        st.metric("📅 Rétention 6M", f"{stats_ret['retention_6_mois']:.1f}%")
 
-        st.divider()
+    st.divider()
 
-        # Heatmap de rétention
-        df_cohort_retention = pd.DataFrame(retention_data['cohort_data'])
+    # Heatmap de rétention (aucun DataFrame construit si l'API ne renvoie aucune cohorte)
+    if stats_ret['nb_cohortes'] > 0:
+        df_cohort_retention = charger_df("/kpi/clients/retention", cle='cohort_data')
 
-        if len(df_cohort_retention) > 0:
-            st.markdown("**📊 Matrice de Rétention (12 dernières cohortes)**")
-            st.markdown("*Chaque ligne = cohorte (mois première commande), Chaque colonne = mois depuis première commande*")
+        st.markdown("**📊 Matrice de Rétention (12 dernières cohortes)**")
+        st.markdown("*Chaque ligne = cohorte (mois première commande), Chaque colonne = mois depuis première commande*")
 
-            # Créer une matrice pour la heatmap
-            cohort_cols = [col for col in df_cohort_retention.columns if col.startswith('month_')]
+        # Créer une matrice pour la heatmap (tableau float32 contigu, sans DataFrame intermédiaire)
+        cohort_cols = df_cohort_retention.columns[df_cohort_retention.columns.str.startswith('month_')]
 
-            if len(cohort_cols) > 0:
-                matrix_data = df_cohort_retention[['cohort'] + cohort_cols].set_index('cohort')
+        if len(cohort_cols) > 0:
+            matrice_retention = df_cohort_retention[cohort_cols].to_numpy(dtype=np.float32)
 
-                fig_retention = px.imshow(
-                    matrix_data,
-                    labels=dict(x="Mois depuis 1ère commande", y="Cohorte", color="Rétention (%)"),
-                    x=[f"M{i}" for i in range(len(cohort_cols))],
-                    y=matrix_data.index,
-                    color_continuous_scale='RdYlGn',
-                    aspect='auto',
-                    height=500
-                )
+            fig_retention = px.imshow(
+                matrice_retention,
+                labels=dict(x="Mois depuis 1ère commande", y="Cohorte", color="Rétention (%)"),
+                x=[f"M{i}" for i in range(matrice_retention.shape[1])],
+                y=df_cohort_retention['cohort'].to_numpy(),
+                color_continuous_scale='RdYlGn',
+                aspect='auto',
+                height=500
+            )
 
-                fig_retention.update_xaxes(side="bottom")
-                st.plotly_chart(fig_retention, use_container_width=True)
+            fig_retention.update_xaxes(side="bottom")
+            fig_retention.update_layout(uirevision='constant')
+            st.plotly_chart(fig_retention, use_container_width=True, key='fig_retention')
 
-                st.info("💡 **Interprétation** : Plus la couleur est verte, meilleure est la rétention. Les cohortes récentes ont moins de données historiques (normal).")
-            else:
-                st.warning("Pas assez de données pour afficher la matrice de rétention.")
+            st.info("💡 **Interprétation** : Plus la couleur est verte, meilleure est la rétention. Les cohortes récentes ont moins de données historiques (normal).")
         else:
-            st.warning("Aucune donnée de cohorte disponible.")
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                L'analyse de cohorte révèle des taux de rétention alarmants : seulement 6,1% des clients rachètent après 1 mois, 8,6% après 3 mois et 10,2% après 6 mois. La matrice par cohorte (12 derniers mois) montre un schéma récurrent de forte attrition : le premier mois (M0) affiche 100% de rétention (vert), puis chute drastiquement à moins de 20% dès M1-M2 (rouge), avec quelques périodes de réactivation sporadiques (jaune-orange). Cette hémorragie de clients nouveaux indique un problème majeur d'onboarding ou d'adéquation produit-marché : moins de 10% des nouveaux clients deviennent récurrents, obligeant à une acquisition constante coûteuse plutôt qu'à capitaliser sur une base fidèle. Des actions d'activation post-première commande sont critiques pour inverser cette tendance.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+            st.warning("Pas assez de données pour afficher la matrice de rétention.")
+    else:
+        st.warning("Aucune donnée de cohorte disponible.")
+
+    afficher_storytelling(INFO_CARD_RETENTION)
+
+
+@st.fragment
+def afficher_clients():
+    """👥 Onglet Clients"""
+    st.markdown("### 👥 Analyse Clients")
+    st.markdown("*Comportement client, fidélisation, segmentation et valeur vie client*")
+    st.divider()
+
+    # Sous-onglets : seul le sous-onglet sélectionné est exécuté (et n'appelle que ses endpoints)
+    sous_onglets = {
+        "📊 Vue Générale": afficher_vue_clients,
+        "🎯 Segmentation RFM": afficher_rfm,
+        "💰 Customer Lifetime Value": afficher_clv,
+        "🔄 Délai de Réachat": afficher_delai_rachat,
+        "📈 Taux de Rétention": afficher_retention
+    }
+    vue = st.radio(
+        "Analyse clients",
+        options=list(sous_onglets),
+        horizontal=True,
+        label_visibility="collapsed",
+        key="client_vue"
+    )
+    sous_onglets[vue]()
+
 
 # =============================================
 # TAB 6 : ANALYSE DES PERTES
 # =============================================
-with tab6:
+# --- COMMANDES EN PERTE ---
+@st.fragment
+def afficher_commandes_perte():
+    """🔴 Sous-onglet Commandes en perte"""
+    st.markdown("#### 🔴 Commandes en Perte")
+    st.markdown("*Identification des commandes générant une perte nette - Analyse des causes (remises excessives, coûts élevés, mix produits)*")
+
+    nb_cmd_def = st.slider("Nombre de commandes", 10, 100, 50, key="cmd_def")
+
+    # Seules les colonnes affichées sont demandées à l'API
+    params_cmd_def = {'limite': nb_cmd_def, 'fields': _CHAMPS_CMD_DEF}
+    cmd_def_data = appeler_api("/kpi/commandes/deficitaires", params=params_cmd_def)
+
+    # Statistiques
+    stats_cmd = cmd_def_data['statistiques']
+    col_d1, col_d2, col_d3, col_d4 = st.columns(4)
+    with col_d1:
+        st.metric("🔴 Nb Commandes", stats_cmd['nb_commandes_deficitaires'])
+    with col_d2:
+        st.metric("💸 Perte Totale", formater_euro(stats_cmd['perte_totale']))
+    with col_d3:
+        st.metric("📊 Perte Moyenne", formater_euro(stats_cmd['perte_moyenne']))
+    with col_d4:
+        st.metric("📈 % Commandes", f"{stats_cmd['pct_commandes_deficitaires']:.2f}%")
+
+    df_cmd_def = charger_df("/kpi/commandes/deficitaires", params=params_cmd_def, cle='data')
+
+    if len(df_cmd_def) > 0:
+        # Graphique des pertes
+        fig_def = px.bar(
+            df_cmd_def.head(20)[['order_id', 'perte_abs', 'discount_moyen']],
+            x='order_id',
+            y='perte_abs',
+            color='discount_moyen',
+            title="Top 20 Commandes Déficitaires (valeur absolue de la perte)",
+            labels={'perte_abs': 'Perte (€)', 'order_id': 'Commande', 'discount_moyen': 'Discount (%)'},
+            color_continuous_scale='Reds',
+            height=450
+        )
+        fig_def.update_xaxes(tickangle=-45)
+        fig_def.update_layout(uirevision='constant')
+        st.plotly_chart(fig_def, use_container_width=True, key='fig_def')
+
+        # Tableau détaillé
+        with st.expander("📋 Tableau détaillé des commandes déficitaires"):
+            st.checkbox("Afficher", key="show_cmd_def_table")
+            if st.session_state.get("show_cmd_def_table"):
+                st.dataframe(
+                    df_cmd_def,
+                    column_order=['order_id', 'date', 'client', 'categories', 'ca', 'profit', 'marge_pct', 'discount_moyen'],
+                    column_config={
+                        'order_id': st.column_config.TextColumn('Commande'),
+                        'date': st.column_config.TextColumn('Date'),
+                        'client': st.column_config.TextColumn('Client'),
+                        'categories': st.column_config.TextColumn('Catégories'),
+                        'ca': st.column_config.NumberColumn('CA (€)', format='%.2f'),
+                        'profit': st.column_config.NumberColumn('Profit (€)', format='%.2f'),
+                        'marge_pct': st.column_config.NumberColumn('Marge (%)', format='%.2f'),
+                        'discount_moyen': st.column_config.NumberColumn('Discount (%)', format='%.2f')
+                    },
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+    afficher_storytelling(INFO_CARD_COMMANDES_PERTE)
+
+
+# --- MARGES INSUFFISANTES ---
+@st.fragment
+def afficher_cout_prix():
+    """💰 Sous-onglet Marges insuffisantes"""
+    st.markdown("#### 💰 Produits à Marges Insuffisantes")
+    st.markdown("*Identification des produits dont le prix de vente est trop proche du coût - Risque de perte en cas de remises ou coûts imprévus*")
+
+    nb_prod_cout = st.slider("Nombre de produits", 10, 50, 30, key="prod_cout")
+
+    # Seules les colonnes affichées sont demandées à l'API
+    params_cout = {'limite': nb_prod_cout, 'fields': _CHAMPS_COUT}
+    cout_prix_data = appeler_api("/kpi/produits/cout-prix", params=params_cout)
+
+    # Statistiques
+    stats_cout = cout_prix_data['statistiques']
+    col_c1, col_c2, col_c3 = st.columns(3)
+    with col_c1:
+        st.metric("💰 Prix Unit. Moyen", formater_euro(stats_cout['prix_unitaire_moyen']))
+    with col_c2:
+        st.metric("📊 Coût Unit. Moyen", formater_euro(stats_cout['cout_unitaire_moyen']))
+    with col_c3:
+        st.metric("💎 Marge Unit. Moyenne", formater_euro(stats_cout['marge_unitaire_moyenne']))
+
+    df_cout = charger_df("/kpi/produits/cout-prix", params=params_cout, cle='data')
+    df_cout['categorie'] = df_cout['categorie'].astype('category')
+
+    # Graphique Prix vs Coût (libellés tronqués calculés une seule fois pour les deux traces)
+    produits_courts = tronquer_libelles(df_cout['produit'])
+    fig_cout = go.Figure()
+
+    fig_cout.add_trace(go.Bar(
+        name='Prix Unitaire',
+        x=produits_courts,
+        y=df_cout['prix_unitaire'].to_numpy(),
+        marker_color='#2ecc71'
+    ))
+
+    fig_cout.add_trace(go.Bar(
+        name='Coût Unitaire',
+        x=produits_courts,
+        y=df_cout['cout_unitaire'].to_numpy(),
+        marker_color='#e74c3c'
+    ))
+
+    fig_cout.update_layout(
+        title="Prix Unitaire vs Coût Unitaire",
+        barmode='group',
+        height=500,
+        xaxis_tickangle=-45
+    )
+
+    fig_cout.update_layout(uirevision='constant')
+    st.plotly_chart(fig_cout, use_container_width=True, key='fig_cout')
+
+    # Tableau détaillé
+    with st.expander("📋 Tableau détaillé"):
+        st.checkbox("Afficher", key="show_cout_table")
+        if st.session_state.get("show_cout_table"):
+            st.dataframe(
+                df_cout,
+                column_order=['produit', 'categorie', 'prix_unitaire', 'cout_unitaire', 'marge_unitaire', 'marge_pct', 'quantite_vendue'],
+                column_config={
+                    'produit': st.column_config.TextColumn('Produit'),
+                    'categorie': st.column_config.TextColumn('Catégorie'),
+                    'prix_unitaire': st.column_config.NumberColumn('Prix Unit. (€)', format='%.2f'),
+                    'cout_unitaire': st.column_config.NumberColumn('Coût Unit. (€)', format='%.2f'),
+                    'marge_unitaire': st.column_config.NumberColumn('Marge Unit. (€)', format='%.2f'),
+                    'marge_pct': st.column_config.NumberColumn('Marge (%)', format='%.2f'),
+                    'quantite_vendue': st.column_config.NumberColumn('Qté Vendue', format='%d')
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+
+    afficher_storytelling(INFO_CARD_COUT_PRIX)
+
+
+def afficher_pertes():
+    """💸 Onglet Analyse des pertes"""
     st.markdown("### 💸 Analyse des Pertes")
     st.markdown("*Identification et analyse des sources de pertes : commandes déficitaires, impact des remises excessives et marges faibles*")
     st.divider()
 
+    # Appels des trois sous-onglets lancés en parallèle (réponses lues ensuite dans le cache)
+    prechargements_pertes = precharger_api({
+        'cmd_def': ("/kpi/commandes/deficitaires", (('fields', _CHAMPS_CMD_DEF), ('limite', st.session_state.get("cmd_def", 50)))),
+        'remises': ("/kpi/remises/impact", ()),
+        'cout': ("/kpi/produits/cout-prix", (('fields', _CHAMPS_COUT), ('limite', st.session_state.get("prod_cout", 30))))
+    })
+    attendre_prechargements(prechargements_pertes)
+
     detail_tab1, detail_tab2, detail_tab3 = st.tabs([
         "🔴 Commandes en Perte",
         "💸 Pertes liées aux Remises",
@@ -1582,68 +2427,7 @@ with tab6:
 
     # --- COMMANDES EN PERTE ---
     with detail_tab1:
-        st.markdown("#### 🔴 Commandes en Perte")
-        st.markdown("*Identification des commandes générant une perte nette - Analyse des causes (remises excessives, coûts élevés, mix produits)*")
-
-        nb_cmd_def = st.slider("Nombre de commandes", 10, 100, 50, key="cmd_def")
-
-        cmd_def_data = appeler_api("/kpi/commandes/deficitaires", params={'limite': nb_cmd_def})
-
-        # Statistiques
-        stats_cmd = cmd_def_data['statistiques']
-        col_d1, col_d2, col_d3, col_d4 = st.columns(4)
-        with col_d1:
-            st.metric("🔴 Nb Commandes", stats_cmd['nb_commandes_deficitaires'])
-        with col_d2:
-            st.metric("💸 Perte Totale", formater_euro(stats_cmd['perte_totale']))
-        with col_d3:
-            st.metric("📊 Perte Moyenne", formater_euro(stats_cmd['perte_moyenne']))
-        with col_d4:
-            st.metric("📈 % Commandes", f"{stats_cmd['pct_commandes_deficitaires']:.2f}%")
-
-        df_cmd_def = pd.DataFrame(cmd_def_data['data'])
-
-        if len(df_cmd_def) > 0:
-            # Graphique des pertes
-            fig_def = px.bar(
-                df_cmd_def.head(20),
-                x='order_id',
-                y='perte_abs',
-                color='discount_moyen',
-                title="Top 20 Commandes Déficitaires (valeur absolue de la perte)",
-                labels={'perte_abs': 'Perte (€)', 'order_id': 'Commande', 'discount_moyen': 'Discount (%)'},
-                color_continuous_scale='Reds',
-                height=450
-            )
-            fig_def.update_xaxes(tickangle=-45)
-            st.plotly_chart(fig_def, use_container_width=True)
-
-            # Tableau détaillé
-            with st.expander("📋 Tableau détaillé des commandes déficitaires"):
-                st.dataframe(
-                    df_cmd_def[['order_id', 'date', 'client', 'categories', 'ca', 'profit', 'marge_pct', 'discount_moyen']].rename(columns={
-                        'order_id': 'Commande',
-                        'date': 'Date',
-                        'client': 'Client',
-                        'categories': 'Catégories',
-                        'ca': 'CA (€)',
-                        'profit': 'Profit (€)',
-                        'marge_pct': 'Marge (%)',
-                        'discount_moyen': 'Discount (%)'
-                    }),
-                    use_container_width=True,
-                    hide_index=True
-                )
-        
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                Sur les 5 009 commandes totales, 1 022 (20,40%) génèrent une perte nette de 66 897€, soit une perte moyenne de 65€ par commande déficitaire. Le top 20 des commandes les plus déficitaires révèle des pertes allant jusqu'à 7 000€ (commande CA-2017-160326), principalement causées par des remises excessives (50-80% de discount en rouge foncé). Cette hémorragie financière concentrée sur quelques transactions catastrophiques indique un manque de contrôle sur les politiques de remise : certaines commandes sont vendues à perte massive, détruisant plusieurs milliers d'euros de marge. L'entreprise doit immédiatement instaurer des seuils d'approbation pour les remises supérieures à 20% et investiguer ces transactions aberrantes pour identifier s'il s'agit d'erreurs commerciales, de tarifications inadaptées ou de clients exploitant les politiques de discount.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        afficher_commandes_perte()
 
     # --- PERTES LIÉES AUX REMISES ---
     with detail_tab2:
@@ -1676,458 +2460,224 @@ with tab6:
 
         st.divider()
 
-        # Graphique par tranche de remise
-        df_remises = pd.DataFrame(remises_data['data'])
-
-        fig_remises = make_subplots(
-            rows=1, cols=2,
-            subplot_titles=("Impact sur le CA", "Impact sur la Marge"),
-            specs=[[{"type": "bar"}, {"type": "bar"}]]
-        )
-
-        fig_remises.add_trace(
-            go.Bar(
-                x=df_remises['tranche_discount'],
-                y=df_remises['ca_total'],
-                name='CA',
-                marker_color='#3498db',
-                text=df_remises['ca_total'].apply(lambda x: f"{x:,.0f}€"),
-                textposition='outside'
-            ),
-            row=1, col=1
-        )
-
-        fig_remises.add_trace(
-            go.Bar(
-                x=df_remises['tranche_discount'],
-                y=df_remises['marge_pct'],
-                name='Marge %',
-                marker_color='#e74c3c',
-                text=df_remises['marge_pct'].apply(lambda x: f"{x:.1f}%"),
-                textposition='outside'
-            ),
-            row=1, col=2
-        )
-
-        fig_remises.update_layout(height=400, showlegend=False)
-        fig_remises.update_xaxes(title_text="Tranche de remise", row=1, col=1)
-        fig_remises.update_xaxes(title_text="Tranche de remise", row=1, col=2)
-        fig_remises.update_yaxes(title_text="CA (€)", row=1, col=1)
-        fig_remises.update_yaxes(title_text="Marge (%)", row=1, col=2)
+        # Graphiques par tranche de remise : deux figures indépendantes, mises en cache
+        df_remises = charger_df("/kpi/remises/impact", cle='data')
+        fig_remises_ca, fig_remises_marge = construire_figs_remises(remises_data)
 
-        st.plotly_chart(fig_remises, use_container_width=True)
+        col_rem1, col_rem2 = st.columns(2)
+        with col_rem1:
+            st.plotly_chart(fig_remises_ca, use_container_width=True, key='fig_remises_ca')
+        with col_rem2:
+            st.plotly_chart(fig_remises_marge, use_container_width=True, key='fig_remises_marge')
 
         # Tableau détaillé
         with st.expander("📋 Détail par tranche de remise"):
             st.dataframe(
-                df_remises[['tranche_discount', 'nb_commandes', 'ca_total', 'profit_total', 'marge_pct', 'ca_moyen']].rename(columns={
-                    'tranche_discount': 'Tranche',
-                    'nb_commandes': 'Nb Commandes',
-                    'ca_total': 'CA (€)',
-                    'profit_total': 'Profit (€)',
-                    'marge_pct': 'Marge (%)',
-                    'ca_moyen': 'CA Moyen (€)'
-                }),
+                df_remises,
+                column_order=['tranche_discount', 'nb_commandes', 'ca_total', 'profit_total', 'marge_pct', 'ca_moyen'],
+                column_config={
+                    'tranche_discount': st.column_config.TextColumn('Tranche'),
+                    'nb_commandes': st.column_config.NumberColumn('Nb Commandes', format='%d'),
+                    'ca_total': st.column_config.NumberColumn('CA (€)', format='%.2f'),
+                    'profit_total': st.column_config.NumberColumn('Profit (€)', format='%.2f'),
+                    'marge_pct': st.column_config.NumberColumn('Marge (%)', format='%.2f'),
+                    'ca_moyen': st.column_config.NumberColumn('CA Moyen (€)', format='%.2f')
+                },
                 use_container_width=True,
                 hide_index=True
             )
 
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                L'analyse comparative révèle un paradoxe destructeur : 52,64% du CA (1,2M€) bénéficie de remises, générant une marge négative catastrophique de -2,86%, tandis que les ventes sans remise (1,09M€) affichent une marge saine de 29,51%. Les remises supérieures à 20% créent une destruction massive de valeur avec une marge de -40%, et même les tranches 0-5% et 5-10% dégradent significativement la rentabilité (respectivement 29,5% et 16,6% de marge). Cette politique de remise agressive transforme plus de la moitié du CA en activité déficitaire : chaque euro de remise accordée coûte bien plus qu'il ne rapporte. L'entreprise doit radicalement restreindre les remises, interdire tout discount au-delà de 15%, et former les commerciaux à vendre la valeur plutôt que le prix pour restaurer la rentabilité.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        afficher_storytelling(INFO_CARD_REMISES)
 
     # --- MARGES INSUFFISANTES ---
     with detail_tab3:
-        st.markdown("#### 💰 Produits à Marges Insuffisantes")
-        st.markdown("*Identification des produits dont le prix de vente est trop proche du coût - Risque de perte en cas de remises ou coûts imprévus*")
-
-        nb_prod_cout = st.slider("Nombre de produits", 10, 50, 30, key="prod_cout")
-
-        cout_prix_data = appeler_api("/kpi/produits/cout-prix", params={'limite': nb_prod_cout})
-
-        # Statistiques
-        stats_cout = cout_prix_data['statistiques']
-        col_c1, col_c2, col_c3 = st.columns(3)
-        with col_c1:
-            st.metric("💰 Prix Unit. Moyen", formater_euro(stats_cout['prix_unitaire_moyen']))
-        with col_c2:
-            st.metric("📊 Coût Unit. Moyen", formater_euro(stats_cout['cout_unitaire_moyen']))
-        with col_c3:
-            st.metric("💎 Marge Unit. Moyenne", formater_euro(stats_cout['marge_unitaire_moyenne']))
-
-        df_cout = pd.DataFrame(cout_prix_data['data'])
-
-        # Graphique Prix vs Coût
-        fig_cout = go.Figure()
-
-        fig_cout.add_trace(go.Bar(
-            name='Prix Unitaire',
-            x=df_cout['produit'].str[:30] + '...',
-            y=df_cout['prix_unitaire'],
-            marker_color='#2ecc71'
-        ))
-
-        fig_cout.add_trace(go.Bar(
-            name='Coût Unitaire',
-            x=df_cout['produit'].str[:30] + '...',
-            y=df_cout['cout_unitaire'],
-            marker_color='#e74c3c'
-        ))
-
-        fig_cout.update_layout(
-            title="Prix Unitaire vs Coût Unitaire",
-            barmode='group',
-            height=500,
-            xaxis_tickangle=-45
-        )
+        afficher_cout_prix()
 
-        st.plotly_chart(fig_cout, use_container_width=True)
-
-        # Tableau détaillé
-        with st.expander("📋 Tableau détaillé"):
-            st.dataframe(
-                df_cout[['produit', 'categorie', 'prix_unitaire', 'cout_unitaire', 'marge_unitaire', 'marge_pct', 'quantite_vendue']].rename(columns={
-                    'produit': 'Produit',
-                    'categorie': 'Catégorie',
-                    'prix_unitaire': 'Prix Unit. (€)',
-                    'cout_unitaire': 'Coût Unit. (€)',
-                    'marge_unitaire': 'Marge Unit. (€)',
-                    'marge_pct': 'Marge (%)',
-                    'quantite_vendue': 'Qté Vendue'
-                }),
-                use_container_width=True,
-                hide_index=True
-            )
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                Le graphique Prix vs Coût révèle plusieurs produits vendus à perte ou quasi à perte, notamment le Canon imageCLASS (près de 4 000€ de prix pour un coût similaire) et plusieurs systèmes de reliure où le coût dépasse le prix de vente (barres rouges supérieures aux vertes). Ces références toxiques nécessitent une action immédiate : augmentation tarifaire de 15-25%, renégociation des prix d'achat fournisseurs, ou retrait pur et simple du catalogue pour éviter de subventionner les clients avec des produits non rentables.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
 
 # =============================================
 # TAB 7 : LIVRAISONS
 # =============================================
-with tab7:
-    st.markdown("### 🚚 Analyse des Livraisons")
-    st.markdown("*Performance logistique : délais, retards et modes d'expédition*")
-    st.divider()
-
-    livraison_tab1, livraison_tab2, livraison_tab3 = st.tabs([
-        "📦 Délais de Livraison",
-        "⏰ Livraisons Tardives",
-        "🚚 Performance par Mode"
-    ])
-
-    # --- DÉLAIS DE LIVRAISON ---
-    with livraison_tab1:
-        st.markdown("#### 📦 Délais de Livraison Réels")
-        st.markdown("*Analyse des délais entre commande et livraison effective*")
-
-        delais_data = appeler_api("/kpi/livraisons/delais")
-
-        # Statistiques globales
-        stats_delais = delais_data['statistiques']
-        col_d1, col_d2, col_d3, col_d4 = st.columns(4)
-        with col_d1:
-            st.metric("📅 Délai Moyen", f"{stats_delais['delai_moyen_jours']:.1f} jours")
-        with col_d2:
-            st.metric("📊 Délai Médian", f"{stats_delais['delai_median_jours']:.1f} jours")
-        with col_d3:
-            st.metric("⚡ Délai Min", f"{stats_delais['delai_min_jours']} jours")
-        with col_d4:
-            st.metric("🐌 Délai Max", f"{stats_delais['delai_max_jours']} jours")
-
-        st.divider()
-
-        # Par mode d'expédition
-        df_delais_mode = pd.DataFrame(delais_data['par_mode'])
-
-        fig_delais_mode = go.Figure()
-
-        fig_delais_mode.add_trace(go.Bar(
-            name='Délai Moyen',
-            x=df_delais_mode['mode'],
-            y=df_delais_mode['delai_moyen'],
-            marker_color='#3498db',
-            text=df_delais_mode['delai_moyen'].apply(lambda x: f"{x:.1f}j"),
-            textposition='outside'
-        ))
+# --- DÉLAIS DE LIVRAISON ---
+def afficher_delais_livraison():
+    """📦 Sous-onglet Délais de livraison"""
+    st.markdown("#### 📦 Délais de Livraison Réels")
+    st.markdown("*Analyse des délais entre commande et livraison effective*")
+
+    delais_data = appeler_api("/kpi/livraisons/delais")
+
+    # Statistiques globales
+    stats_delais = delais_data['statistiques']
+    col_d1, col_d2, col_d3, col_d4 = st.columns(4)
+    with col_d1:
+        st.metric("📅 Délai Moyen", f"{stats_delais['delai_moyen_jours']:.1f} jours")
+    with col_d2:
+        st.metric("📊 Délai Médian", f"{stats_delais['delai_median_jours']:.1f} jours")
+    with col_d3:
+        st.metric("⚡ Délai Min", f"{stats_delais['delai_min_jours']} jours")
+    with col_d4:
+        st.metric("🐌 Délai Max", f"{stats_delais['delai_max_jours']} jours")
 
-        fig_delais_mode.add_trace(go.Bar(
-            name='Délai Médian',
-            x=df_delais_mode['mode'],
-            y=df_delais_mode['delai_median'],
-            marker_color='#2ecc71',
-            text=df_delais_mode['delai_median'].apply(lambda x: f"{x:.1f}j"),
-            textposition='outside'
-        ))
-
-        fig_delais_mode.update_layout(
-            title="Délais de Livraison par Mode d'Expédition",
-            xaxis_title="Mode d'Expédition",
-            yaxis_title="Délai (jours)",
-            barmode='group',
-            height=450
-        )
-
-        st.plotly_chart(fig_delais_mode, use_container_width=True)
-
-        # Distribution des délais
-        distribution_delais = delais_data['distribution']
-        df_distrib_delais = pd.DataFrame([
-            {'tranche': k, 'nb_livraisons': v}
-            for k, v in distribution_delais.items()
-        ])
-
-        col_dist1, col_dist2 = st.columns([2, 1])
-
-        with col_dist1:
-            fig_distrib_delais = px.bar(
-                df_distrib_delais,
-                x='tranche',
-                y='nb_livraisons',
-                title="Distribution des Délais de Livraison",
-                labels={'tranche': 'Tranche de délai', 'nb_livraisons': 'Nombre de livraisons'},
-                color='nb_livraisons',
-                color_continuous_scale='Blues',
-                height=400
-            )
-            st.plotly_chart(fig_distrib_delais, use_container_width=True)
-
-        with col_dist2:
-            # Par région
-            df_delais_region = pd.DataFrame(delais_data['par_region'])
-
-            fig_delais_region = px.bar(
-                df_delais_region.sort_values('delai_moyen', ascending=True),
-                y='region',
-                x='delai_moyen',
-                orientation='h',
-                title="Délai Moyen par Région",
-                labels={'delai_moyen': 'Délai (j)', 'region': 'Région'},
-                color='delai_moyen',
-                color_continuous_scale='Oranges',
-                height=400
-            )
-            st.plotly_chart(fig_delais_region, use_container_width=True)
-
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                Les délais de livraison moyens et médians s'établissent à 4 jours, avec un minimum de 0 jour (livraison le jour même) et un maximum de 7 jours, démontrant une performance logistique plutôt correcte. L'analyse par mode d'expédition montre que First Class et Second Class offrent les délais les plus courts (2 & 3 jours moyens/médians) après Same day qui est à 0 jours, tandis que Standard Class prend logiquement plus de temps (5 jours). La distribution des délais révèle une forte concentration dans les tranches 2-4 jours et 4-7 jours (environ 4 000 livraisons chacun), avec très peu de retards extrêmes (>7 jours). Par région, Central affiche les délais les plus élevés (4 jours), suggérant des contraintes géographiques ou logistiques. Cette performance opérationnelle satisfaisante constitue un atout compétitif à capitaliser dans la communication client, tout en optimisant la région Central pour homogénéiser le service.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-
-    # --- LIVRAISONS TARDIVES ---
-    with livraison_tab2:
-        st.markdown("#### ⏰ Analyse des Livraisons Tardives")
-        st.markdown("*Identification et analyse des retards de livraison*")
-
-        retards_data = appeler_api("/kpi/livraisons/retards")
+    st.divider()
 
-        # Statistiques globales
-        stats_retards = retards_data['statistiques']
-        col_r1, col_r2, col_r3 = st.columns(3)
-        with col_r1:
-            st.metric("📦 Total Livraisons", formater_nombre(stats_retards['nb_total_livraisons']))
-        with col_r2:
-            st.metric("⏰ Livraisons en Retard", formater_nombre(stats_retards['nb_retards']))
-        with col_r3:
-            st.metric("📊 Taux de Retard", f"{stats_retards['taux_retard_global']:.2f}%")
+    # Figures construites une seule fois pour une même réponse API
+    fig_delais_mode, fig_distrib_delais, fig_delais_region = construire_figs_delais(delais_data)
 
-        # Affichage des seuils
-        seuils = retards_data['seuils_utilises']
-        st.info(f"**Seuils de retard utilisés** : {', '.join([f'{k}: {v}j' for k, v in seuils.items()])}")
+    st.plotly_chart(fig_delais_mode, use_container_width=True, key='fig_delais_mode')
 
-        st.divider()
+    col_dist1, col_dist2 = st.columns([2, 1])
 
-        # Par mode d'expédition
-        df_retards_mode = pd.DataFrame(retards_data['par_mode'])
-
-        col_mode1, col_mode2 = st.columns(2)
-
-        with col_mode1:
-            fig_retards_mode = px.bar(
-                df_retards_mode,
-                x='mode',
-                y='taux_retard',
-                title="Taux de Retard par Mode d'Expédition",
-                labels={'taux_retard': 'Taux de Retard (%)', 'mode': 'Mode'},
-                text='taux_retard',
-                color='taux_retard',
-                color_continuous_scale='Reds',
-                height=400
-            )
-            fig_retards_mode.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-            st.plotly_chart(fig_retards_mode, use_container_width=True)
-
-        with col_mode2:
-            # Par région
-            df_retards_region = pd.DataFrame(retards_data['par_region'])
-
-            fig_retards_region = px.bar(
-                df_retards_region,
-                x='region',
-                y='taux_retard',
-                title="Taux de Retard par Région",
-                labels={'taux_retard': 'Taux de Retard (%)', 'region': 'Région'},
-                text='taux_retard',
-                color='taux_retard',
-                color_continuous_scale='Oranges',
-                height=400
-            )
-            fig_retards_region.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-            st.plotly_chart(fig_retards_region, use_container_width=True)
+    with col_dist1:
+        st.plotly_chart(fig_distrib_delais, use_container_width=True, key='fig_distrib_delais')
 
-        # Par catégorie
-        df_retards_categorie = pd.DataFrame(retards_data['par_categorie'])
+    with col_dist2:
+        st.plotly_chart(fig_delais_region, use_container_width=True, key='fig_delais_region')
 
-        fig_retards_cat = px.pie(
-            df_retards_categorie,
-            values='nb_retards',
-            names='categorie',
-            title="Répartition des Retards par Catégorie",
-            height=400
-        )
-        st.plotly_chart(fig_retards_cat, use_container_width=True)
+    afficher_storytelling(INFO_CARD_DELAIS_LIVRAISON)
 
-        # Tableau détaillé
-        with st.expander("📋 Tableau détaillé par mode"):
-            st.dataframe(
-                df_retards_mode[['mode', 'nb_retards', 'nb_total', 'taux_retard']].rename(columns={
-                    'mode': 'Mode',
-                    'nb_retards': 'Nb Retards',
-                    'nb_total': 'Nb Total',
-                    'taux_retard': 'Taux (%)'
-                }),
-                use_container_width=True,
-                hide_index=True
-            )
 
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                Sur 9 994 livraisons totales, seulement 1 livraison est en retard (0,01%), démontrant une excellence opérationnelle quasi-parfaite. Cette unique livraison tardive provient du mode First Class et de la région East. La totalité des retards provient de la catégorie Office Supplies. Cette performance logistique exceptionnelle constitue un différenciateur majeur face à la concurrence : 99,99% de fiabilité de livraison est un argument commercial puissant qui devrait être mis en avant dans toute la communication, renforçant la confiance client et justifiant potentiellement des prix premium par rapport aux concurrents moins fiables.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+# --- LIVRAISONS TARDIVES ---
+def afficher_retards():
+    """⏰ Sous-onglet Livraisons tardives"""
+    st.markdown("#### ⏰ Analyse des Livraisons Tardives")
+    st.markdown("*Identification et analyse des retards de livraison*")
 
-    # --- PERFORMANCE PAR MODE ---
-    with livraison_tab3:
-        st.markdown("#### 🚚 Performance par Mode d'Expédition")
-        st.markdown("*Analyse complète : rentabilité, rapidité et volume*")
+    retards_data = appeler_api("/kpi/livraisons/retards")
 
-        perf_mode_data = appeler_api("/kpi/livraisons/performance-mode")
+    # Statistiques globales
+    stats_retards = retards_data['statistiques']
+    col_r1, col_r2, col_r3 = st.columns(3)
+    with col_r1:
+        st.metric("📦 Total Livraisons", formater_nombre(stats_retards['nb_total_livraisons']))
+    with col_r2:
+        st.metric("⏰ Livraisons en Retard", formater_nombre(stats_retards['nb_retards']))
+    with col_r3:
+        st.metric("📊 Taux de Retard", f"{stats_retards['taux_retard_global']:.2f}%")
 
-        # Insights
-        insights = perf_mode_data['insights']
-        col_i1, col_i2, col_i3 = st.columns(3)
-        with col_i1:
-            st.metric("💰 Plus Rentable", insights['mode_plus_rentable'])
-        with col_i2:
-            st.metric("⚡ Plus Rapide", insights['mode_plus_rapide'])
-        with col_i3:
-            st.metric("📊 Plus Utilisé", insights['mode_plus_utilise'])
+    # Affichage des seuils
+    seuils = retards_data['seuils_utilises']
+    st.info(f"**Seuils de retard utilisés** : {', '.join([f'{k}: {v}j' for k, v in seuils.items()])}")
 
-        st.divider()
+    st.divider()
 
-        # Données
-        df_perf_mode = pd.DataFrame(perf_mode_data['data'])
+    # Figures construites une seule fois pour une même réponse API
+    fig_retards_mode, fig_retards_region, fig_retards_cat = construire_figs_retards(retards_data)
 
-        # Graphique comparatif
-        fig_perf_compare = make_subplots(
-            rows=2, cols=2,
-            subplot_titles=("CA par Mode", "Nombre de Commandes", "Délai Moyen", "Marge"),
-            specs=[[{"type": "bar"}, {"type": "bar"}],
-                   [{"type": "bar"}, {"type": "bar"}]]
-        )
+    col_mode1, col_mode2 = st.columns(2)
 
-        fig_perf_compare.add_trace(
-            go.Bar(x=df_perf_mode['mode'], y=df_perf_mode['ca'], name='CA', marker_color='#3498db'),
-            row=1, col=1
-        )
+    with col_mode1:
+        st.plotly_chart(fig_retards_mode, use_container_width=True, key='fig_retards_mode')
 
-        fig_perf_compare.add_trace(
-            go.Bar(x=df_perf_mode['mode'], y=df_perf_mode['nb_commandes'], name='Commandes', marker_color='#2ecc71'),
-            row=1, col=2
-        )
+    with col_mode2:
+        st.plotly_chart(fig_retards_region, use_container_width=True, key='fig_retards_region')
 
-        fig_perf_compare.add_trace(
-            go.Bar(x=df_perf_mode['mode'], y=df_perf_mode['delai_moyen'], name='Délai', marker_color='#e74c3c'),
-            row=2, col=1
-        )
+    st.plotly_chart(fig_retards_cat, use_container_width=True, key='fig_retards_cat')
 
-        fig_perf_compare.add_trace(
-            go.Bar(x=df_perf_mode['mode'], y=df_perf_mode['marge_pct'], name='Marge', marker_color='#f39c12'),
-            row=2, col=2
+    # Tableau détaillé
+    with st.expander("📋 Tableau détaillé par mode"):
+        df_retards_mode = charger_df("/kpi/livraisons/retards", cle='par_mode')
+        st.dataframe(
+            df_retards_mode,
+            column_order=['mode', 'nb_retards', 'nb_total', 'taux_retard'],
+            column_config={
+                'mode': st.column_config.TextColumn('Mode'),
+                'nb_retards': st.column_config.NumberColumn('Nb Retards', format='%d'),
+                'nb_total': st.column_config.NumberColumn('Nb Total', format='%d'),
+                'taux_retard': st.column_config.NumberColumn('Taux (%)', format='%.2f')
+            },
+            use_container_width=True,
+            hide_index=True
         )
 
-        fig_perf_compare.update_layout(height=700, showlegend=False)
-        fig_perf_compare.update_xaxes(tickangle=-45)
+    afficher_storytelling(INFO_CARD_RETARDS)
 
-        st.plotly_chart(fig_perf_compare, use_container_width=True)
 
-        # Scatter : Rapidité vs Rentabilité
-        st.markdown("#### ⚖️ Compromis Rapidité vs Rentabilité")
+# --- PERFORMANCE PAR MODE ---
+def afficher_perf_mode():
+    """🚚 Sous-onglet Performance par mode"""
+    st.markdown("#### 🚚 Performance par Mode d'Expédition")
+    st.markdown("*Analyse complète : rentabilité, rapidité et volume*")
 
-        fig_scatter = px.scatter(
-            df_perf_mode,
-            x='delai_moyen',
-            y='marge_pct',
-            size='nb_commandes',
-            color='mode',
-            hover_name='mode',
-            hover_data={'ca': ':.2f', 'profit': ':.2f', 'nb_commandes': True},
-            title="Délai Moyen vs Marge (taille = volume)",
-            labels={'delai_moyen': 'Délai Moyen (jours)', 'marge_pct': 'Marge (%)', 'nb_commandes': 'Nb Commandes'},
-            height=500
-        )
+    perf_mode_data = appeler_api("/kpi/livraisons/performance-mode")
 
-        st.plotly_chart(fig_scatter, use_container_width=True)
+    # Insights
+    insights = perf_mode_data['insights']
+    col_i1, col_i2, col_i3 = st.columns(3)
+    with col_i1:
+        st.metric("💰 Plus Rentable", insights['mode_plus_rentable'])
+    with col_i2:
+        st.metric("⚡ Plus Rapide", insights['mode_plus_rapide'])
+    with col_i3:
+        st.metric("📊 Plus Utilisé", insights['mode_plus_utilise'])
 
-        # Tableau récapitulatif
-        st.markdown("#### 📋 Tableau Récapitulatif")
+    st.divider()
 
-        st.dataframe(
-            df_perf_mode[['mode', 'ca', 'profit', 'marge_pct', 'nb_commandes', 'pct_commandes', 'delai_moyen', 'delai_median']].rename(columns={
-                'mode': 'Mode',
-                'ca': 'CA (€)',
-                'profit': 'Profit (€)',
-                'marge_pct': 'Marge (%)',
-                'nb_commandes': 'Nb Commandes',
-                'pct_commandes': '% Commandes',
-                'delai_moyen': 'Délai Moy. (j)',
-                'delai_median': 'Délai Méd. (j)'
-            }),
-            use_container_width=True,
-            hide_index=True
-        )
+    # Figures construites une seule fois pour une même réponse API
+    fig_perf_compare, fig_scatter = construire_figs_perf_mode(perf_mode_data)
+
+    st.plotly_chart(fig_perf_compare, use_container_width=True, key='fig_perf_compare')
+
+    # Scatter : Rapidité vs Rentabilité
+    st.markdown("#### ⚖️ Compromis Rapidité vs Rentabilité")
+    st.plotly_chart(fig_scatter, use_container_width=True, key='fig_scatter')
+
+    # Tableau récapitulatif
+    st.markdown("#### 📋 Tableau Récapitulatif")
+
+    df_perf_mode = charger_df("/kpi/livraisons/performance-mode", cle='data')
+    st.dataframe(
+        df_perf_mode,
+        column_order=['mode', 'ca', 'profit', 'marge_pct', 'nb_commandes', 'pct_commandes', 'delai_moyen', 'delai_median'],
+        column_config={
+            'mode': st.column_config.TextColumn('Mode'),
+            'ca': st.column_config.NumberColumn('CA (€)', format='%.2f'),
+            'profit': st.column_config.NumberColumn('Profit (€)', format='%.2f'),
+            'marge_pct': st.column_config.NumberColumn('Marge (%)', format='%.2f'),
+            'nb_commandes': st.column_config.NumberColumn('Nb Commandes', format='%d'),
+            'pct_commandes': st.column_config.NumberColumn('% Commandes', format='%.2f'),
+            'delai_moyen': st.column_config.NumberColumn('Délai Moy. (j)', format='%.2f'),
+            'delai_median': st.column_config.NumberColumn('Délai Méd. (j)', format='%.2f')
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+
+    afficher_storytelling(INFO_CARD_PERF_MODE)
+
+
+@st.fragment
+def afficher_livraisons():
+    """🚚 Onglet Livraisons"""
+    st.markdown("### 🚚 Analyse des Livraisons")
+    st.markdown("*Performance logistique : délais, retards et modes d'expédition*")
+    st.divider()
 
-        st.markdown(
-            """
-            <div class="info-card">
-                <div class="info-title">Data Storytelling</div>
-                Standard Class domine massivement avec 1,36M€ de CA et 2 994 commandes, mais génère la marge la plus faible avec un délai de 5 jours, créant un dilemme stratégique visualisé dans le graphique de compromis. First Class, bien que ne représentant que 351 000€ de CA et 787 commandes, affiche la meilleure marge (13,93%) avec le délai le plus rapide après Same Day, démontrant qu'une livraison plus rapide peut être plus rentable. Same Day, malgré son délai minimal, affiche un positionnement intermédiaire peu attractif avec seulement 128 000€, 264 commandes et une marge de 12,38%, ne justifiant pas son coût opérationnel. Cette analyse croisée révèle une opportunité stratégique majeure : migrer progressivement 20-30% des clients Standard Class vers First Class ou Second Class en valorisant la réduction de délai (-2 à -3 jours) contre une légère surcharge tarifaire améliorerait simultanément la marge globale de 1-2 points, la satisfaction client, et l'efficacité opérationnelle, tout en compensant largement les coûts logistiques supplémentaires par une meilleure rentabilité unitaire.
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+    # Sous-onglets : seul le sous-onglet sélectionné est exécuté (et n'appelle que son endpoint)
+    sous_onglets = {
+        "📦 Délais de Livraison": afficher_delais_livraison,
+        "⏰ Livraisons Tardives": afficher_retards,
+        "🚚 Performance par Mode": afficher_perf_mode
+    }
+    vue = st.radio(
+        "Analyse des livraisons",
+        options=list(sous_onglets),
+        horizontal=True,
+        label_visibility="collapsed",
+        key="livraison_vue"
+    )
+    sous_onglets[vue]()
+
+
+# === AFFICHAGE DE LA SECTION ACTIVE ===
+AFFICHAGE_SECTIONS = {
+    "priorites": afficher_priorites,
+    "produits": afficher_produits_categories,
+    "temporel": afficher_temporel,
+    "geographie": afficher_geographie,
+    "clients": afficher_clients,
+    "pertes": afficher_pertes,
+    "livraisons": afficher_livraisons
+}
+AFFICHAGE_SECTIONS[section]()
 
 st.divider()
 
@@ -0,0 +1,23 @@
+"""
+Formatage des valeurs affichées (montants, nombres, pourcentages) au format français
+📦 Module importé : ses caches survivent aux reruns Streamlit, contrairement à ceux du script
+"""
+
+import functools
+
+# Séparateurs français (milliers : espace, décimales : virgule) appliqués en une seule passe
+_SEPARATEURS_FR = str.maketrans({",": " ", ".": ","})
+
+
+@functools.lru_cache(maxsize=2048)
+def formater_euro(valeur: float) -> str:
+    return f"{valeur:,.2f} €".translate(_SEPARATEURS_FR)
+
+
+@functools.lru_cache(maxsize=2048)
+def formater_nombre(valeur: int) -> str:
+    return f"{valeur:,}".translate(_SEPARATEURS_FR)
+
+
+def formater_pourcentage(valeur: float) -> str:
+    return f"{valeur:.2f}%"